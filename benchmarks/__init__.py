@@ -0,0 +1 @@
+"""Offline benchmarks, run them with `python -m benchmarks.<module>`."""
@@ -0,0 +1,300 @@
+"""End-to-end client benchmarks against local fake SmartPost API.
+
+Drives `smartpost.Client` and `smartpost.sync.Client` through typical scenarios
+and reports p50/p99 latency, operations per second and peak memory. Results can
+be saved as JSON to track regressions over time:
+
+    python -m benchmarks.client_suite --latency 0.02 --json results.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import tracemalloc
+from dataclasses import asdict, dataclass
+from statistics import quantiles
+from time import perf_counter
+from typing import Any, Callable, List
+
+from benchmarks.data import make_orders
+from benchmarks.fake_api import FakeSmartPostAPI
+from smartpost.cache import DestinationCache
+from smartpost.chunks import chunked
+from smartpost.client import Client
+from smartpost.models import ShipmentOrder
+from smartpost.sync.client import Client as SyncClient
+
+
+@dataclass
+class Result:
+    scenario: str
+    client: str
+    runs: int
+    p50_ms: float
+    p99_ms: float
+    ops_per_second: float
+    peak_memory_kib: float
+    requests: int
+
+
+def summarize(
+    scenario: str,
+    client: str,
+    timings: List[float],
+    total: float,
+    peak: int,
+    requests: int,
+) -> Result:
+    if len(timings) > 1:
+        percentiles = quantiles(timings, n=100, method="inclusive")
+        p50, p99 = percentiles[49], percentiles[98]
+    else:
+        p50 = p99 = timings[0]
+
+    return Result(
+        scenario=scenario,
+        client=client,
+        runs=len(timings),
+        p50_ms=p50 * 1000,
+        p99_ms=p99 * 1000,
+        ops_per_second=len(timings) / total,
+        peak_memory_kib=peak / 1024,
+        requests=requests,
+    )
+
+
+@dataclass
+class Scenario:
+    name: str
+    runs: int
+    #: Returns awaitable for async client and result for sync one
+    operation: Callable[[Any], Any]
+    #: Reuse single client with warmed up destination cache for all runs
+    warm: bool = False
+
+
+def add_orders(orders: List[ShipmentOrder]) -> Callable[[Any], Any]:
+    return lambda client: client.add_shipment_orders(orders, chunk_size=500)
+
+
+def get_labels(barcodes: List[str]) -> Callable[[Any], Any]:
+    return lambda client: client.get_labels_pdf("A6", barcodes)
+
+
+def save_labels(barcodes: List[str]) -> Callable[[Any], Any]:
+    path = os.path.join(tempfile.gettempdir(), "aiosmartpost-benchmark.pdf")
+    return lambda client: client.save_labels_pdf("A6", barcodes, path)
+
+
+def orders_with_labels(
+    orders: List[ShipmentOrder], pipelined: bool
+) -> Callable[[Any], Any]:
+    """Adds orders in chunks of 100 and requests labels for every chunk."""
+
+    def sequential_sync(client: SyncClient) -> None:
+        for chunk in chunked(orders, 100):
+            orders_info = client.add_shipment_orders(chunk)
+            client.get_labels_pdf("A6", [info.barcode for info in orders_info])
+
+    async def sequential_async(client: Client) -> None:
+        for chunk in chunked(orders, 100):
+            orders_info = await client.add_shipment_orders(chunk)
+            await client.get_labels_pdf("A6", [info.barcode for info in orders_info])
+
+    def pipelined_sync(client: SyncClient) -> None:
+        for _ in client.add_shipment_orders_with_labels(orders, "A6"):
+            pass
+
+    async def pipelined_async(client: Client) -> None:
+        async for _ in client.add_shipment_orders_with_labels(orders, "A6"):
+            pass
+
+    def operation(client: Any) -> Any:
+        if isinstance(client, SyncClient):
+            return pipelined_sync(client) if pipelined else sequential_sync(client)
+
+        return pipelined_async(client) if pipelined else sequential_async(client)
+
+    return operation
+
+
+def all_destinations(concurrent: bool) -> Callable[[Any], Any]:
+    """Fetches all four destination lists, one by one or with one call."""
+
+    def sequential_sync(client: SyncClient) -> None:
+        client.get_ee_terminals()
+        client.get_ee_express_terminals()
+        client.get_fi_terminals()
+        client.get_fi_post_offices()
+
+    async def sequential_async(client: Client) -> None:
+        await client.get_ee_terminals()
+        await client.get_ee_express_terminals()
+        await client.get_fi_terminals()
+        await client.get_fi_post_offices()
+
+    def operation(client: Any) -> Any:
+        if concurrent:
+            return client.get_all_destinations()
+
+        if isinstance(client, SyncClient):
+            return sequential_sync(client)
+
+        return sequential_async(client)
+
+    return operation
+
+
+def scenarios(runs: int) -> List[Scenario]:
+    def get_terminals(client: Any) -> Any:
+        return client.get_ee_terminals()
+
+    items = [
+        Scenario("cold terminals fetch", runs, get_terminals),
+        Scenario("warm terminals fetch", runs * 10, get_terminals, warm=True),
+    ]
+    for concurrent in (False, True):
+        name = "concurrent" if concurrent else "sequential"
+        items.append(
+            Scenario(
+                f"all destination lists, {name}", runs, all_destinations(concurrent)
+            )
+        )
+
+    for count in (1, 100, 1000, 10_000):
+        items.append(
+            Scenario(
+                f"add {count} orders",
+                max(1, runs // max(1, count // 100)),
+                add_orders(make_orders(count)),
+            )
+        )
+
+    for count in (10, 1000):
+        barcodes = [f"{i:016d}" for i in range(count)]
+        items.append(
+            Scenario(
+                f"labels PDF for {count} barcodes",
+                max(1, runs // max(1, count // 10)),
+                get_labels(barcodes),
+            )
+        )
+
+    barcodes = [f"{i:016d}" for i in range(1000)]
+    items.append(
+        Scenario("save labels PDF for 1000 barcodes", 1, save_labels(barcodes))
+    )
+    orders = make_orders(1000)
+    for pipelined in (False, True):
+        name = "pipelined" if pipelined else "sequential"
+        items.append(
+            Scenario(
+                f"1000 orders + labels, {name}",
+                max(1, runs // 10),
+                orders_with_labels(orders, pipelined),
+            )
+        )
+
+    return items
+
+
+async def run_async(api: FakeSmartPostAPI, scenario: Scenario) -> Result:
+    warm = None
+    if scenario.warm:
+        warm = Client(transport=api.transport(), destination_cache=DestinationCache())
+        await scenario.operation(warm)
+
+    timings = []
+    requests_before = api.requests
+    tracemalloc.start()
+    started = perf_counter()
+    for _ in range(scenario.runs):
+        client = warm or Client(transport=api.transport())
+        op_started = perf_counter()
+        await scenario.operation(client)
+        timings.append(perf_counter() - op_started)
+        if client is not warm:
+            await client.close()
+
+    total = perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    if warm is not None:
+        await warm.close()
+
+    requests = api.requests - requests_before
+    return summarize(scenario.name, "async", timings, total, peak, requests)
+
+
+def run_sync(api: FakeSmartPostAPI, scenario: Scenario) -> Result:
+    warm = None
+    if scenario.warm:
+        warm = SyncClient(
+            transport=api.transport(sync=True), destination_cache=DestinationCache()
+        )
+        scenario.operation(warm)
+
+    timings = []
+    requests_before = api.requests
+    tracemalloc.start()
+    started = perf_counter()
+    for _ in range(scenario.runs):
+        client = warm or SyncClient(transport=api.transport(sync=True))
+        op_started = perf_counter()
+        scenario.operation(client)
+        timings.append(perf_counter() - op_started)
+        if client is not warm:
+            client.close()
+
+    total = perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    if warm is not None:
+        warm.close()
+
+    requests = api.requests - requests_before
+    return summarize(scenario.name, "sync", timings, total, peak, requests)
+
+
+async def run_all_async(api: FakeSmartPostAPI, runs: int) -> List[Result]:
+    return [await run_async(api, scenario) for scenario in scenarios(runs)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds")
+    parser.add_argument("--destinations", type=int, default=500)
+    parser.add_argument("--label-size", type=int, default=50_000, help="bytes")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--json", help="file to save results to")
+    args = parser.parse_args()
+
+    api = FakeSmartPostAPI(
+        latency=args.latency,
+        destinations_count=args.destinations,
+        label_size=args.label_size,
+    )
+    results = asyncio.run(run_all_async(api, args.runs))
+    results.extend(run_sync(api, scenario) for scenario in scenarios(args.runs))
+
+    print(
+        f"{'scenario':<34} {'client':<6} {'runs':>5} {'p50 ms':>9} {'p99 ms':>9} "
+        f"{'ops/s':>9} {'peak KiB':>10} {'requests':>9}"
+    )
+    for result in results:
+        print(
+            f"{result.scenario:<34} {result.client:<6} {result.runs:>5} "
+            f"{result.p50_ms:>9.2f} {result.p99_ms:>9.2f} "
+            f"{result.ops_per_second:>9.1f} {result.peak_memory_kib:>10.0f} "
+            f"{result.requests:>9}"
+        )
+
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump([asdict(result) for result in results], file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+from random import Random
+from typing import List
+from xml.sax.saxutils import escape
+
+from smartpost.models import (
+    Destination,
+    EETerminalDestination,
+    FIDestination,
+    Recipient,
+    ShipmentDestination,
+    ShipmentOrder,
+)
+
+# Rough bounding boxes of Estonia and Finland (lat_min, lat_max, lng_min, lng_max)
+BOUNDS = {
+    "EE": (57.5, 59.7, 21.8, 28.2),
+    "FI": (59.8, 70.0, 20.5, 31.5),
+}
+CITIES = {
+    "EE": ["Tallinn", "Tartu", "Narva", "Pärnu", "Viljandi", "Jõhvi", "Võru"],
+    "FI": ["Helsinki", "Espoo", "Tampere", "Vantaa", "Oulu", "Turku", "Jyväskylä"],
+}
+
+
+def make_destinations(
+    count: int, country: str = "EE", seed: int = 1
+) -> List[Destination]:
+    """Generates `count` realistic-looking destinations spread across country."""
+    rnd = Random(seed)
+    lat_min, lat_max, lng_min, lng_max = BOUNDS[country]
+    destinations = []
+    for i in range(count):
+        city = rnd.choice(CITIES[country])
+        destinations.append(
+            Destination(
+                place_id=100 + i,
+                name=f"{city} pakiautomaat {i}",
+                city=city,
+                address=f"Tänav {rnd.randint(1, 200)}",
+                country=country,  # type: ignore[arg-type]
+                postalcode=f"{rnd.randint(10000, 99999)}",
+                routingcode=f"{rnd.randint(100, 999)}",
+                availability="24h",
+                description="",
+                lat=round(rnd.uniform(lat_min, lat_max), 6),
+                lng=round(rnd.uniform(lng_min, lng_max), 6),
+            )
+        )
+
+    return destinations
+
+
+def destinations_xml(destinations: List[Destination]) -> bytes:
+    """Renders destinations the same way SmartPost API does."""
+    items = []
+    for destination in destinations:
+        fields = "".join(
+            f"<{name}>{escape(str(value))}</{name}>"
+            for name, value in (
+                ("place_id", destination.place_id),
+                ("name", destination.name),
+                ("city", destination.city),
+                ("address", destination.address),
+                ("country", destination.country),
+                ("postalcode", destination.postalcode),
+                ("routingcode", destination.routingcode),
+                ("availability", destination.availability),
+                ("description", destination.description),
+                ("lat", destination.lat),
+                ("lng", destination.lng),
+            )
+        )
+        items.append(f"<item>{fields}</item>")
+
+    document = "".join(items)
+    header = '<?xml version="1.0" encoding="UTF-8"?>\n'
+    return f"{header}<destinations>{document}</destinations>".encode()
+
+
+def make_orders(count: int, seed: int = 1) -> List[ShipmentOrder]:
+    """Generates shipment orders with all kinds of optional fields."""
+    rnd = Random(seed)
+    orders = []
+    for i in range(count):
+        destination: ShipmentDestination
+        if rnd.random() < 0.7:
+            destination = EETerminalDestination(rnd.randint(100, 999))
+        else:
+            destination = FIDestination(f"{rnd.randint(10000, 99999)}", "3202")
+
+        orders.append(
+            ShipmentOrder(
+                recipient=Recipient(
+                    name=rnd.choice(["Mari Tamm", "Jüri Õun", "A & B <OÜ>", ""]),
+                    phone=f"+3725{rnd.randint(100000, 999999)}",
+                    email=f"customer{i}@example.com",
+                    cash=rnd.choice([None, 12.5]),
+                    idcode=rnd.choice([None, 38001010000]),
+                ),
+                destination=destination,
+                barcode=rnd.choice([None, f"{i:016d}"]),
+                reference=str(i),
+                content=rnd.choice([None, "Raamatud > 2 tk", "Kingad"]),
+                weight=rnd.choice([None, 1.25]),
+                size=rnd.choice([None, 5, 8]),  # type: ignore[arg-type]
+            )
+        )
+
+    return orders
@@ -0,0 +1,80 @@
+"""Compares `DestinationIndex` queries with linear haversine scan."""
+
+from random import Random
+from typing import List, Tuple
+
+from benchmarks.data import make_destinations
+from benchmarks.utils import measure, report
+from smartpost.diff import DestinationTracker
+from smartpost.index import DestinationIndex, haversine_km
+from smartpost.models import Destination
+
+
+def naive_nearest(
+    destinations: List[Destination], lat: float, lng: float, k: int
+) -> List[Tuple[Destination, float]]:
+    distances = [(d, haversine_km(lat, lng, d.lat, d.lng)) for d in destinations]
+    distances.sort(key=lambda pair: pair[1])
+    return distances[:k]
+
+
+def naive_within(
+    destinations: List[Destination], lat: float, lng: float, radius_km: float
+) -> List[Tuple[Destination, float]]:
+    distances = [(d, haversine_km(lat, lng, d.lat, d.lng)) for d in destinations]
+    return sorted(
+        (pair for pair in distances if pair[1] <= radius_km), key=lambda pair: pair[1]
+    )
+
+
+def bench(count: int, rnd: Random) -> None:
+    destinations = make_destinations(count, "EE")
+    index = DestinationIndex(destinations)
+    points = [(rnd.uniform(57.6, 59.6), rnd.uniform(22, 28)) for _ in range(100)]
+
+    # Sanity check: both approaches return the same destinations
+    for lat, lng in points:
+        expected = [d.place_id for d, _ in naive_nearest(destinations, lat, lng, 5)]
+        actual = [d.place_id for d, _ in index.nearest(lat, lng, 5)]
+        assert expected == actual, (lat, lng)  # nosec: B101
+        expected = [d.place_id for d, _ in naive_within(destinations, lat, lng, 15)]
+        actual = [d.place_id for d, _ in index.within(lat, lng, 15)]
+        assert sorted(expected) == sorted(actual), (lat, lng)  # nosec: B101
+
+    lat, lng = points[0]
+    print(f"{count} destinations:")
+    report(
+        "  nearest(k=5)",
+        measure(lambda: naive_nearest(destinations, lat, lng, 5), 50),
+        measure(lambda: index.nearest(lat, lng, 5), 2000),
+    )
+    report(
+        "  within(15 km)",
+        measure(lambda: naive_within(destinations, lat, lng, 15), 50),
+        measure(lambda: index.within(lat, lng, 15), 2000),
+    )
+    refreshed = make_destinations(count, "EE")
+    refreshed[0] = make_destinations(1, "EE", seed=3)[0]
+    report(
+        "  rebuild vs update (1 changed)",
+        measure(lambda: DestinationIndex(refreshed), 5),
+        measure(lambda: index.update(refreshed), 20),
+    )
+    # Tracker reports the change once, then refreshes are no-ops for callbacks
+    tracker = DestinationTracker(destinations)
+    tracker.on_change(index.apply)
+    report(
+        "  rebuild vs tracker + apply",
+        measure(lambda: DestinationIndex(refreshed), 5),
+        measure(lambda: tracker.update(refreshed), 20),
+    )
+
+
+def main() -> None:
+    rnd = Random(2)
+    for count in (500, 2000, 10000):
+        bench(count, rnd)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Measures memory retained per destination by different representations."""
+
+import gc
+import tracemalloc
+from dataclasses import dataclass, fields
+from typing import Callable, List, Tuple
+
+from benchmarks.data import destinations_xml, make_destinations
+from smartpost.models import Destination
+from smartpost.parsing import parse_destinations
+from smartpost.table import DestinationTable
+
+
+@dataclass
+class DictDestination:
+    """`Destination` as it was before: regular dataclass with `__dict__`."""
+
+    place_id: int
+    name: str
+    city: str
+    address: str
+    country: str
+    postalcode: str
+    routingcode: str
+    availability: str
+    description: str
+    lat: float
+    lng: float
+
+
+def dict_destinations(document: bytes) -> List[DictDestination]:
+    names = [field.name for field in fields(Destination)]
+    return [
+        DictDestination(**{name: getattr(d, name) for name in names})
+        for d in parse_destinations(document)
+    ]
+
+
+def retained(build: Callable[[], object]) -> Tuple[int, object]:
+    """Returns number of bytes allocated by `build` and still alive after it."""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current, result
+
+
+def bench(count: int) -> None:
+    document = destinations_xml(make_destinations(count))
+    print(f"{count} destinations, bytes per destination:")
+    for name, build in (
+        ("dataclass with __dict__", lambda: dict_destinations(document)),
+        ("slotted Destination", lambda: parse_destinations(document)),
+        ("DestinationTable", lambda: DestinationTable(parse_destinations(document))),
+    ):
+        size, result = retained(build)
+        print(f"  {name:<28} {size / count:>8.0f}")
+        del result
+
+
+def main() -> None:
+    for count in (2000, 10000):
+        bench(count)
+
+
+if __name__ == "__main__":
+    main()
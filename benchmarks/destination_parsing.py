@@ -0,0 +1,100 @@
+"""Compares streaming `DestinationParser` with xmltodict full-document parsing."""
+
+import tracemalloc
+from time import perf_counter
+from typing import Callable, List, Tuple
+
+from xmltodict import parse as parse_xml  # type: ignore[import]
+
+from benchmarks.data import destinations_xml, make_destinations
+from benchmarks.utils import measure, report
+from smartpost.models import Destination
+from smartpost.parsing import DestinationParser
+
+CHUNK_SIZE = 64 * 1024
+
+
+def chunks(document: bytes) -> List[bytes]:
+    starts = range(0, len(document), CHUNK_SIZE)
+    return [document[start:][:CHUNK_SIZE] for start in starts]
+
+
+def xmltodict_path(body: List[bytes]) -> List[Destination]:
+    # Same as before: whole body is joined, parsed to dict and then converted
+    destinations = parse_xml(b"".join(body), force_list=("item",))
+    return [Destination(**item) for item in destinations["destinations"]["item"]]
+
+
+def streaming_path(body: List[bytes]) -> List[Destination]:
+    parser = DestinationParser()
+    destinations = []
+    for chunk in body:
+        destinations.extend(parser.feed(chunk))
+
+    destinations.extend(parser.close())
+    return destinations
+
+
+def streaming_consumer(body: List[bytes]) -> int:
+    """Consumes destinations one by one without keeping them, like `iter_*`."""
+    parser = DestinationParser()
+    count = 0
+    for chunk in body:
+        count += len(parser.feed(chunk))
+
+    return count + len(parser.close())
+
+
+def first_result(body: List[bytes]) -> float:
+    """Seconds until first destination is available to streaming consumer."""
+    started = perf_counter()
+    parser = DestinationParser()
+    for chunk in body:
+        if parser.feed(chunk):
+            break
+
+    return perf_counter() - started
+
+
+def peak_memory(func: Callable[[], object]) -> Tuple[int, object]:
+    tracemalloc.start()
+    result = func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak, result
+
+
+def bench(count: int) -> None:
+    body = chunks(destinations_xml(make_destinations(count)))
+    assert xmltodict_path(body) == streaming_path(body)  # nosec: B101
+
+    print(f"{count} destinations ({sum(map(len, body)) // 1024} KiB):")
+    report(
+        "  parse time",
+        measure(lambda: xmltodict_path(body), 5),
+        measure(lambda: streaming_path(body), 5),
+    )
+    baseline_peak, _ = peak_memory(lambda: xmltodict_path(body))
+    list_peak, _ = peak_memory(lambda: streaming_path(body))
+    consumer_peak, _ = peak_memory(lambda: streaming_consumer(body))
+    print(
+        f"  peak memory: xmltodict {baseline_peak / 1024:.0f} KiB, "
+        f"streaming to list {list_peak / 1024:.0f} KiB, "
+        f"streaming consumer {consumer_peak / 1024:.0f} KiB"
+    )
+    started = perf_counter()
+    xmltodict_path(body)
+    baseline_first = perf_counter() - started
+    print(
+        f"  time to first destination: xmltodict {baseline_first * 1000:.2f} ms, "
+        f"streaming {first_result(body) * 1000:.2f} ms"
+    )
+
+
+def main() -> None:
+    for count in (500, 2000, 10000):
+        bench(count)
+
+
+if __name__ == "__main__":
+    main()
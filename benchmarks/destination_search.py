@@ -0,0 +1,71 @@
+"""Compares `DestinationSearch` autocomplete with linear substring scan."""
+
+from dataclasses import replace
+from typing import List
+
+from benchmarks.data import make_destinations
+from benchmarks.utils import measure, report
+from smartpost.models import Destination
+from smartpost.search import DestinationSearch
+
+FIELDS = ("name", "city", "address", "postalcode")
+
+
+def linear_scan(
+    destinations: List[Destination], query: str, limit: int = 10
+) -> List[Destination]:
+    # Substring checks on every keystroke, as autocomplete did before
+    needle = query.lower()
+    found = [
+        destination
+        for destination in destinations
+        if any(needle in getattr(destination, name).lower() for name in FIELDS)
+    ]
+    return found[:limit]
+
+
+def keystrokes(query: str) -> List[str]:
+    return [query[:end] for end in range(1, len(query) + 1)]
+
+
+def bench(count: int) -> None:
+    finnish = [
+        replace(destination, place_id=destination.place_id + count)
+        for destination in make_destinations(count, "FI")
+    ]
+    destinations = make_destinations(count, "EE") + finnish
+    search = DestinationSearch(destinations)
+    typed = keystrokes("Pärnu pakiautomaat 12")
+    # Sanity check: every destination found by scan is found by index as well
+    query = typed[-1]
+    expected = {d.place_id for d in linear_scan(destinations, query, len(search))}
+    found = {d.place_id for d, _ in search.search(query, len(search))}
+    assert expected and expected <= found, query  # nosec: B101
+
+    print(f"{len(destinations)} destinations:")
+    report(
+        "  typing 'Pärnu pakiautomaat 12'",
+        measure(lambda: [linear_scan(destinations, query) for query in typed], 5),
+        measure(lambda: [search.search(query) for query in typed], 5),
+    )
+    report(
+        "  typo 'Jyvaskyla' (scan finds none)",
+        measure(lambda: linear_scan(destinations, "Jyvaskyla"), 20),
+        measure(lambda: search.search("Jyvaskila"), 20),
+    )
+    refreshed = list(destinations)
+    refreshed[0] = replace(refreshed[0], name="Uus pakiautomaat")
+    report(
+        "  rebuild vs update (1 changed)",
+        measure(lambda: DestinationSearch(refreshed), 3),
+        measure(lambda: search.update(refreshed), 10),
+    )
+
+
+def main() -> None:
+    for count in (500, 2000, 10000):
+        bench(count)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Compares worker startup from destinations snapshot with parsing API response."""
+
+import os
+from tempfile import TemporaryDirectory
+
+from benchmarks.data import destinations_xml, make_destinations
+from benchmarks.utils import measure, report
+from smartpost.parsing import parse_destinations
+from smartpost.snapshot import DestinationSnapshot, SnapshotList, write_snapshot
+
+KEY = ("EE", "APT", "")
+
+
+def open_snapshot(path: str) -> int:
+    """Opens snapshot like a freshly started worker, without touching rows."""
+    with DestinationSnapshot(path) as snapshot:
+        return len(snapshot.lists)
+
+
+def lookup_snapshot(path: str) -> int:
+    """Opens snapshot and reads single destination from it."""
+    with DestinationSnapshot(path) as snapshot:
+        destinations = snapshot.lists[KEY].destinations
+        return destinations[len(destinations) // 2].place_id
+
+
+def materialize_snapshot(path: str) -> int:
+    with DestinationSnapshot(path) as snapshot:
+        return len(list(snapshot.lists[KEY].destinations))
+
+
+def bench(count: int, directory: str) -> None:
+    destinations = make_destinations(count)
+    document = destinations_xml(destinations)
+    path = os.path.join(directory, f"destinations-{count}.snapshot")
+    write_snapshot(path, [SnapshotList(KEY, destinations)])
+    with DestinationSnapshot(path) as snapshot:
+        assert list(snapshot.lists[KEY].destinations) == destinations  # nosec: B101
+
+    print(
+        f"{count} destinations (XML {len(document) // 1024} KiB, "
+        f"snapshot {os.path.getsize(path) // 1024} KiB):"
+    )
+    parse_us = measure(lambda: parse_destinations(document), 5)
+    report("  open snapshot", parse_us, measure(lambda: open_snapshot(path), 20))
+    report(
+        "  open snapshot + 1 lookup",
+        parse_us,
+        measure(lambda: lookup_snapshot(path), 20),
+    )
+    report(
+        "  open snapshot + all rows",
+        parse_us,
+        measure(lambda: materialize_snapshot(path), 5),
+    )
+
+
+def main() -> None:
+    with TemporaryDirectory() as directory:
+        for count in (500, 2000, 10000):
+            bench(count, directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""Local stand-in for SmartPost API, plugged into clients with `httpx.MockTransport`."""
+
+import asyncio
+import time
+from dataclasses import dataclass
+from hashlib import sha1
+from typing import AsyncIterator, Dict, Iterator, List, Tuple
+
+# We don't use it with untrusted random input
+from xml.etree.ElementTree import fromstring  # nosec: B405
+
+from httpx import MockTransport, Request, Response
+
+from benchmarks.data import destinations_xml, make_destinations
+
+DESTINATION_TYPES: Dict[Tuple[str, str, str], Tuple[str, int]] = {
+    # (country, type, filter): (generated country, seed)
+    ("EE", "APT", ""): ("EE", 1),
+    ("EE", "APT", "express"): ("EE", 2),
+    ("FI", "APT", ""): ("FI", 3),
+    ("FI", "PO", ""): ("FI", 4),
+}
+
+
+@dataclass
+class FakeSmartPostAPI:
+    """Serves realistic `destinations`, `shipment` and `labels` responses.
+
+    Orders whose recipient phone does not start with "+" are rejected with
+    400 error document (code 003), just like SmartPost does.
+
+    Args:
+        latency:
+            seconds every response is delayed by (simulated network + API time).
+        destinations_count:
+            number of destinations in every destinations list.
+        label_size:
+            bytes of PDF content generated per label.
+        chunk_size:
+            response body chunk size for streamed PDF responses.
+        labels_status:
+            status of `labels` responses, anything but 200 returns error body
+            (to check how clients handle failed labels requests).
+    """
+
+    latency: float = 0.0
+    destinations_count: int = 500
+    label_size: int = 50_000
+    chunk_size: int = 64 * 1024
+    labels_status: int = 200
+
+    def __post_init__(self) -> None:
+        self.requests = 0
+        self._destinations: Dict[Tuple[str, str, str], Tuple[bytes, str]] = {}
+
+    def transport(self, sync: bool = False) -> MockTransport:
+        return MockTransport(self.handle if sync else self.handle_async)
+
+    def handle(self, request: Request) -> Response:
+        if self.latency:
+            time.sleep(self.latency)
+
+        return self.respond(request, asynchronous=False)
+
+    async def handle_async(self, request: Request) -> Response:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        return self.respond(request, asynchronous=True)
+
+    def respond(self, request: Request, asynchronous: bool) -> Response:
+        self.requests += 1
+        params = request.url.params
+        kind = params.get("request")
+        if kind == "destinations":
+            key = (params.get("country"), params.get("type"), params.get("filter", ""))
+            return self.destinations(request, key)
+
+        if kind == "shipment":
+            return self.shipment(request.read())
+
+        if kind == "labels":
+            return self.labels(request.read(), asynchronous)
+
+        return Response(404)
+
+    def destinations(self, request: Request, key: Tuple[str, str, str]) -> Response:
+        if key not in DESTINATION_TYPES:
+            return Response(200, content=b"<destinations></destinations>")
+
+        if key not in self._destinations:
+            country, seed = DESTINATION_TYPES[key]
+            body = destinations_xml(
+                make_destinations(self.destinations_count, country, seed)
+            )
+            self._destinations[key] = (body, f'"{sha1(body).hexdigest()}"')  # nosec
+
+        body, etag = self._destinations[key]
+        if request.headers.get("If-None-Match") == etag:
+            return Response(304, headers={"ETag": etag})
+
+        return Response(200, content=body, headers={"ETag": etag})
+
+    def shipment(self, body: bytes) -> Response:
+        document = fromstring(body)  # nosec: B314
+        infos: List[str] = []
+        errors: List[str] = []
+        for number, item in enumerate(document.iterfind("item")):
+            reference = item.findtext("reference") or ""
+            barcode = item.findtext("barcode") or f"{number:016d}"
+            phone = item.findtext("recipient/phone") or ""
+            if not phone.startswith("+"):
+                errors.append(
+                    f"<item><barcode>{barcode}</barcode>"
+                    f"<reference>{reference}</reference><error><code>003</code>"
+                    f"<text>Not a phone number</text><input>{phone}</input>"
+                    "</error></item>"
+                )
+            else:
+                infos.append(
+                    f"<item><barcode>{barcode}</barcode>"
+                    f"<reference>{reference}</reference></item>"
+                )
+
+        if errors:
+            return Response(400, content=f"<orders>{''.join(errors)}</orders>".encode())
+
+        return Response(200, content=f"<orders>{''.join(infos)}</orders>".encode())
+
+    def labels(self, body: bytes, asynchronous: bool) -> Response:
+        document = fromstring(body)  # nosec: B314
+        barcodes = [element.text or "" for element in document.iterfind("barcode")]
+        if self.labels_status != 200:
+            return Response(self.labels_status, content=b"<error>boom</error>")
+
+        if asynchronous:
+            return Response(200, content=self._async_pdf_chunks(barcodes))
+
+        return Response(200, content=self._pdf_chunks(barcodes))
+
+    async def _async_pdf_chunks(self, barcodes: List[str]) -> AsyncIterator[bytes]:
+        for chunk in self._pdf_chunks(barcodes):
+            yield chunk
+
+    def _pdf_chunks(self, barcodes: List[str]) -> Iterator[bytes]:
+        yield b"%PDF-1.4\n"
+        for barcode in barcodes:
+            page = f"% label {barcode}\n".encode()
+            remaining = self.label_size
+            while remaining > 0:
+                size = min(remaining, self.chunk_size)
+                yield (page * (size // len(page) + 1))[:size]
+                remaining -= size
+
+        yield b"%%EOF\n"
@@ -0,0 +1,85 @@
+"""Measures import time of smartpost modules with `python -X importtime`.
+
+Also guards lazy imports: modules that don't talk to SmartPost API must not
+import HTTPX, h2 or xmltodict. Exits with status 1 when one of them does.
+"""
+
+import subprocess  # nosec: B404
+import sys
+from typing import Dict, List, Tuple
+
+#: Modules that are loaded lazily (on first network or parse use)
+HEAVY_MODULES = ("httpx", "h2", "xmltodict")
+#: Modules that must stay cheap to import, mapped to heavy modules they may import
+LIGHT_MODULES: Dict[str, Tuple[str, ...]] = {
+    "smartpost": (),
+    "smartpost.models": (),
+    "smartpost.errors": (),
+    "smartpost.validation": (),
+    "smartpost.diff": (),
+    "smartpost.index": (),
+    "smartpost.table": (),
+    "smartpost.sync": (),
+}
+CLIENT_MODULES = ("smartpost.client", "smartpost.sync.client")
+REPEAT = 5
+
+
+def import_times(module: str) -> Dict[str, int]:
+    """Imports module in fresh interpreter, returns cumulative microseconds."""
+    check = f"import sys, {module}; print(' '.join(sys.modules))"
+    result = subprocess.run(  # nosec: B603
+        [sys.executable, "-X", "importtime", "-c", check],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+
+        _, cumulative, name = line.split("|")
+        times[name.strip()] = int(cumulative)
+
+    # Modules loaded by `sys.modules` check itself are not reported, add them
+    for name in result.stdout.split():
+        times.setdefault(name, 0)
+
+    return times
+
+
+def best_time(module: str) -> Tuple[int, List[str]]:
+    """Returns best cumulative import time of module and heavy modules it loads."""
+    best = None
+    loaded: List[str] = []
+    for _ in range(REPEAT):
+        times = import_times(module)
+        loaded = [name for name in HEAVY_MODULES if name in times]
+        best = times[module] if best is None else min(best, times[module])
+
+    return best or 0, loaded
+
+
+def main() -> None:
+    failed = False
+    for module in (*LIGHT_MODULES, *CLIENT_MODULES):
+        microseconds, loaded = best_time(module)
+        unexpected = [
+            name
+            for name in loaded
+            if module in LIGHT_MODULES and name not in LIGHT_MODULES[module]
+        ]
+        failed = failed or bool(unexpected)
+        status = f"   UNEXPECTED: {', '.join(unexpected)}" if unexpected else ""
+        print(
+            f"{module:<24} {microseconds / 1000:>7.1f} ms   "
+            f"heavy: {', '.join(loaded) or '-'}{status}"
+        )
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
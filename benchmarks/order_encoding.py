@@ -0,0 +1,106 @@
+"""Compares direct request body encoding with `ElementTree` based one."""
+
+import tracemalloc
+from time import perf_counter
+from typing import Callable, Iterator, List
+
+# We don't use it with untrusted random input
+from xml.etree.ElementTree import Element, SubElement, tostring  # nosec: B405
+
+from benchmarks.data import make_orders
+from smartpost.chunks import iter_orders_body
+from smartpost.client import Client
+from smartpost.models import ShipmentOrder
+
+REPORT_EMAILS = ["warehouse@example.com"]
+
+
+def element_tree_document(client: Client, orders: List[ShipmentOrder]) -> bytes:
+    # Request body as it was built before
+    document = Element("orders")
+    document.insert(0, client._auth)
+    report_el = SubElement(document, "report")
+    for email in REPORT_EMAILS:
+        email_el = SubElement(report_el, "email")
+        email_el.text = email
+
+    document.extend(order.to_xml() for order in orders)
+    return tostring(document)
+
+
+def orders_per_second(
+    func: Callable[[List[ShipmentOrder]], bytes], orders: List[ShipmentOrder]
+) -> float:
+    repeat = max(1, 20_000 // len(orders))
+    started = perf_counter()
+    for _ in range(repeat):
+        func(orders)
+
+    return repeat * len(orders) / (perf_counter() - started)
+
+
+def lazy_orders(templates: List[ShipmentOrder], count: int) -> Iterator[ShipmentOrder]:
+    """Yields orders one by one, like database cursor would."""
+    for number in range(count):
+        yield templates[number % len(templates)]
+
+
+def peak_memory(func: Callable[[], object]) -> int:
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def streamed_size(client: Client, orders: Iterator[ShipmentOrder]) -> int:
+    start = client._orders_start(REPORT_EMAILS)
+    return sum(map(len, iter_orders_body(start, orders, "</orders>")))
+
+
+def bench_memory(client: Client, templates: List[ShipmentOrder], count: int) -> None:
+    start = client._orders_start(REPORT_EMAILS)
+    streamed = iter_orders_body(start, lazy_orders(templates, count), "</orders>")
+    orders = list(lazy_orders(templates, count))
+    expected = client._orders_document(orders, REPORT_EMAILS)
+    assert b"".join(streamed) == expected, "Streamed body must be the same"  # nosec
+    del orders, expected
+
+    whole = peak_memory(
+        lambda: client._orders_document(
+            list(lazy_orders(templates, count)), REPORT_EMAILS
+        )
+    )
+    stream = peak_memory(lambda: streamed_size(client, lazy_orders(templates, count)))
+    print(
+        f"{count:>6} orders peak memory: whole body {whole / 1024:>8.0f} KiB   "
+        f"streamed {stream / 1024:>6.0f} KiB"
+    )
+
+
+def main() -> None:
+    client = Client("user", "pässword & <secret>")
+    for count in (1, 100, 10_000):
+        orders = make_orders(count)
+        expected = element_tree_document(client, orders)
+        actual = client._orders_document(orders, REPORT_EMAILS)
+        assert expected == actual, "Request body must stay byte-identical"  # nosec
+
+        baseline = orders_per_second(
+            lambda chunk: element_tree_document(client, chunk), orders
+        )
+        optimized = orders_per_second(
+            lambda chunk: client._orders_document(chunk, REPORT_EMAILS), orders
+        )
+        print(
+            f"{count:>6} orders: ElementTree {baseline:>10.0f} orders/s   "
+            f"direct {optimized:>10.0f} orders/s   x{optimized / baseline:.1f}"
+        )
+
+    templates = make_orders(100)
+    for count in (10_000, 100_000):
+        bench_memory(client, templates, count)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Checks that failed chunks of pipelined workflow don't lose created orders.
+
+Runs `add_shipment_orders_with_labels` of both clients against fake SmartPost
+API with rejected orders and with failing labels requests. Exits with status 1
+when an error is not raised or does not carry `OrderInfo` of added orders.
+"""
+
+import asyncio
+import sys
+from dataclasses import replace
+from typing import Any, List, Optional, Tuple, Type
+
+from benchmarks.data import make_orders
+from benchmarks.fake_api import FakeSmartPostAPI
+from smartpost.client import Client
+from smartpost.errors import IncompleteShipmentError, ShipmentOrderBatchError
+from smartpost.models import ShipmentOrder
+from smartpost.sync.client import Client as SyncClient
+
+CHUNK_SIZE = 10
+
+
+def orders_with_bad_phone(count: int, index: int) -> List[ShipmentOrder]:
+    orders = make_orders(count)
+    recipient = replace(orders[index].recipient, phone="5555")
+    orders[index] = replace(orders[index], recipient=recipient)
+    return orders
+
+
+async def run_async(api: FakeSmartPostAPI, orders: List[ShipmentOrder]) -> Any:
+    client = Client(transport=api.transport())
+    try:
+        pairs = client.add_shipment_orders_with_labels(
+            orders, "A6", chunk_size=CHUNK_SIZE
+        )
+        async for _ in pairs:
+            pass
+    except Exception as exc:  # noqa: PIE786 - checked by caller
+        return exc
+    finally:
+        await client.close()
+
+    return None
+
+
+def run_sync(api: FakeSmartPostAPI, orders: List[ShipmentOrder]) -> Any:
+    with SyncClient(transport=api.transport(sync=True)) as client:
+        try:
+            pairs = client.add_shipment_orders_with_labels(
+                orders, "A6", chunk_size=CHUNK_SIZE
+            )
+            for _ in pairs:
+                pass
+        except Exception as exc:  # noqa: PIE786 - checked by caller
+            return exc
+
+    return None
+
+
+def check(
+    name: str,
+    error: Optional[BaseException],
+    expected: Type[Exception],
+    added: Tuple[int, int],
+) -> bool:
+    """Checks error type and number of added orders it carries (min, max)."""
+    if not isinstance(error, expected):
+        print(f"{name:<36} FAILED: expected {expected.__name__}, got {error!r}")
+        return False
+
+    orders_info = getattr(error, "orders_info", [])
+    count = sum(info is not None for info in orders_info)
+    if not added[0] <= count <= added[1]:
+        print(f"{name:<36} FAILED: {count} added orders in error, expected {added}")
+        return False
+
+    print(f"{name:<36} ok: {type(error).__name__} with {count} added orders")
+    return True
+
+
+def main() -> None:
+    rejected = orders_with_bad_phone(30, 12)
+    api = FakeSmartPostAPI(latency=0.01)
+    failing_labels = FakeSmartPostAPI(latency=0.01, labels_status=500)
+    # Chunk after rejected one may be skipped, depending on timing
+    results = [
+        check(
+            "async, rejected chunk",
+            asyncio.run(run_async(api, rejected)),
+            ShipmentOrderBatchError,
+            (10, 20),
+        ),
+        check(
+            "sync, rejected chunk",
+            run_sync(api, rejected),
+            ShipmentOrderBatchError,
+            (10, 20),
+        ),
+        check(
+            "async, failed labels",
+            asyncio.run(run_async(failing_labels, make_orders(30))),
+            IncompleteShipmentError,
+            (10, 30),
+        ),
+        check(
+            "sync, failed labels",
+            run_sync(failing_labels, make_orders(30)),
+            IncompleteShipmentError,
+            (10, 30),
+        ),
+    ]
+    if not all(results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
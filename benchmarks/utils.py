@@ -0,0 +1,19 @@
+from time import perf_counter
+from typing import Callable
+
+
+def measure(func: Callable[[], object], repeat: int) -> float:
+    """Returns average call time of `func` in microseconds."""
+    func()  # warm up
+    started = perf_counter()
+    for _ in range(repeat):
+        func()
+
+    return (perf_counter() - started) / repeat * 1_000_000
+
+
+def report(name: str, baseline_us: float, optimized_us: float) -> None:
+    print(
+        f"{name:<40} naive {baseline_us:>10.1f} us   "
+        f"optimized {optimized_us:>8.1f} us   x{baseline_us / optimized_us:.1f}"
+    )
@@ -29,7 +29,7 @@ setup(
     license="Unlicense",
     author="Igor Nehoroshev",
     author_email="mail@neigor.me",
-    packages=find_packages(exclude=["tests"]),
+    packages=find_packages(exclude=["tests", "benchmarks"]),
     # Use MANIFEST.in for data files
     include_package_data=True,
     zip_safe=False,
@@ -1,4 +1,22 @@
-from smartpost.client import Client
+from typing import TYPE_CHECKING, Any, List
+
+if TYPE_CHECKING:
+    from smartpost.client import Client
 
 __version__ = "0.3.3"
 __all__ = ["Client"]
+
+
+def __getattr__(name: str) -> Any:
+    # Client (and HTTPX with it) is imported on first use, so that models can be
+    # used without paying for it
+    if name == "Client":
+        from smartpost.client import Client
+
+        return Client
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__() -> List[str]:
+    return sorted([*globals(), *__all__])
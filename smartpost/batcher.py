@@ -0,0 +1,159 @@
+from asyncio import Future, Task, TimerHandle, ensure_future, gather, get_running_loop
+from types import TracebackType
+from typing import List, Optional, Set, Type
+
+from smartpost.client import Client
+from smartpost.errors import ShipmentOrderError, match_order_errors
+from smartpost.models import OrderInfo, ShipmentOrder
+
+
+class _PendingOrder:
+    __slots__ = ("order", "future", "resubmitted")
+
+    def __init__(self, order: ShipmentOrder, future: "Future[OrderInfo]") -> None:
+        self.order = order
+        self.future = future
+        self.resubmitted = False
+
+
+class OrderBatcher:
+    """Aggregates shipment orders from many coroutines into batched requests.
+
+    Orders submitted with `submit` are sent with single `add_shipment_orders`
+    call once `max_batch_size` orders are collected or `max_linger` seconds
+    passed since the first of them was submitted.
+
+    When SmartPost rejects a batch, every error is routed to the caller whose
+    order it belongs to (by barcode or reference) and the rest of the orders are
+    resubmitted once in a follow-up batch. Errors that can't be matched to any
+    order fail the whole batch.
+
+    Args:
+        client:
+            `smartpost.Client` instance used to send orders.
+        max_batch_size:
+            maximum number of orders in a single request.
+        max_linger:
+            maximum number of seconds an order waits for batch to fill up.
+        report_emails:
+            optional list of strings with emails to which
+            reports about orders will be sent.
+    """
+
+    def __init__(
+        self,
+        client: Client,
+        *,
+        max_batch_size: int = 100,
+        max_linger: float = 0.05,
+        report_emails: Optional[List[str]] = None,
+    ) -> None:
+        self.client = client
+        self.max_batch_size = max_batch_size
+        self.max_linger = max_linger
+        self.report_emails = report_emails
+        self._pending: List[_PendingOrder] = []
+        self._timer: Optional[TimerHandle] = None
+        self._in_flight: Set["Task[None]"] = set()
+
+    async def __aenter__(self) -> "OrderBatcher":
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        await self.flush()
+
+    async def submit(self, order: ShipmentOrder) -> OrderInfo:
+        """Adds shipment order to the next batch and waits until it is sent.
+
+        Returns:
+            An `OrderInfo` instance representing added order.
+
+        Raises:
+            ShipmentOrderError:
+                SmartPost API had issues with this shipment order.
+        """
+        future: "Future[OrderInfo]" = get_running_loop().create_future()
+        self._enqueue([_PendingOrder(order, future)])
+        return await future
+
+    async def flush(self) -> None:
+        """Sends pending orders right away and waits for all batches in flight."""
+        self._send_pending()
+        while self._in_flight:
+            await gather(*self._in_flight, return_exceptions=True)
+
+    def _enqueue(self, pending: List[_PendingOrder]) -> None:
+        self._pending.extend(pending)
+        if len(self._pending) >= self.max_batch_size:
+            self._send_pending()
+        elif self._timer is None:
+            self._timer = get_running_loop().call_later(
+                self.max_linger, self._send_pending
+            )
+
+    def _send_pending(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        size = self.max_batch_size
+        while self._pending:
+            batch, self._pending = self._pending[:size], self._pending[size:]
+            task = ensure_future(self._send(batch))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    async def _send(self, batch: List[_PendingOrder]) -> None:
+        orders = [pending.order for pending in batch]
+        try:
+            orders_info = await self.client.add_shipment_orders(
+                orders, self.report_emails
+            )
+        except ShipmentOrderError as exc:
+            self._route_errors(batch, exc)
+        except Exception as exc:  # noqa: PIE786 - delivered to every caller
+            for pending in batch:
+                _set_exception(pending.future, exc)
+        else:
+            for pending, info in zip(batch, orders_info):
+                if not pending.future.done():
+                    pending.future.set_result(info)
+
+    def _route_errors(
+        self, batch: List[_PendingOrder], exc: ShipmentOrderError
+    ) -> None:
+        matched, unmatched = match_order_errors(
+            [pending.order for pending in batch], exc.errors
+        )
+        if unmatched or not matched:
+            # Can't tell which orders are wrong, whole batch fails
+            for pending in batch:
+                _set_exception(pending.future, exc)
+
+            return
+
+        resubmit = []
+        for index, pending in enumerate(batch):
+            if index in matched:
+                error = ShipmentOrderError.from_details(matched[index])
+                _set_exception(pending.future, error)
+            elif pending.resubmitted:
+                _set_exception(pending.future, exc)
+            else:
+                pending.resubmitted = True
+                resubmit.append(pending)
+
+        if resubmit:
+            # Valid orders were rejected together with invalid ones, send them again
+            self._pending[:0] = resubmit
+            self._send_pending()
+
+
+def _set_exception(future: "Future[OrderInfo]", exc: BaseException) -> None:
+    if not future.done():
+        future.set_exception(exc)
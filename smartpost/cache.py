@@ -0,0 +1,507 @@
+import os
+import re
+from collections import OrderedDict
+from contextlib import suppress
+from dataclasses import dataclass, field
+from hashlib import sha256
+from threading import Lock, Thread, get_ident
+from time import monotonic, time
+from typing import Dict, List, Optional, Sequence, Set, Tuple, Union
+
+from smartpost.errors import SnapshotError
+from smartpost.models import Destination
+from smartpost.snapshot import DestinationSnapshot, SnapshotList, write_snapshot
+
+#: (country, type, filter) - filter is empty string when not used
+DestinationKey = Tuple[str, str, str]
+#: (format, barcodes) - single barcode for labels cached one by one
+LabelKey = Tuple[str, Tuple[str, ...]]
+# Label files are named after SHA-256 of their key, nothing else is touched
+_LABEL_FILE = re.compile(r"[0-9a-f]{64}\.pdf")
+#: Keys of destination lists fetched by `get_all_destinations`, by result field
+DESTINATION_LISTS: Dict[str, DestinationKey] = {
+    "ee_terminals": ("EE", "APT", ""),
+    "ee_express_terminals": ("EE", "APT", "express"),
+    "fi_terminals": ("FI", "APT", ""),
+    "fi_post_offices": ("FI", "PO", ""),
+}
+
+
+@dataclass
+class DestinationCacheEntry:
+    destinations: List[Destination]
+    #: Validators from response headers, used for conditional requests
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    fetched_at: float = field(default_factory=monotonic)
+
+    @property
+    def validators(self) -> Dict[str, str]:
+        """Headers for conditional request that revalidates this entry."""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+
+        return headers
+
+
+@dataclass
+class AllDestinations:
+    """Result of `get_all_destinations`, lists that failed to load are `None`."""
+
+    ee_terminals: Optional[List[Destination]] = None
+    ee_express_terminals: Optional[List[Destination]] = None
+    fi_terminals: Optional[List[Destination]] = None
+    fi_post_offices: Optional[List[Destination]] = None
+    #: Errors of lists that failed to load, by field name (e.g. "fi_terminals")
+    errors: Dict[str, Exception] = field(default_factory=dict)
+
+    @classmethod
+    def from_outcomes(
+        cls, outcomes: Sequence[Union[List[Destination], BaseException]]
+    ) -> "AllDestinations":
+        """Creates result from lists or exceptions in `DESTINATION_LISTS` order.
+
+        Raises:
+            BaseException: that is not `Exception` (e.g. cancellation) is re-raised.
+        """
+        result = cls()
+        for name, outcome in zip(DESTINATION_LISTS, outcomes):
+            if isinstance(outcome, Exception):
+                result.errors[name] = outcome
+            elif isinstance(outcome, BaseException):
+                raise outcome
+            else:
+                setattr(result, name, outcome)
+
+        return result
+
+    @property
+    def ok(self) -> bool:
+        """All lists were loaded."""
+        return not self.errors
+
+    def raise_for_errors(self) -> None:
+        """Raises error of the first list that failed to load, if any."""
+        for error in self.errors.values():
+            raise error
+
+
+class DestinationCache:
+    """In-memory cache for destination lists with stale-while-revalidate semantics.
+
+    Entries younger than `ttl` seconds are served as is. Older entries are still
+    served (stale), while client refreshes them in background - only one refresh
+    per key runs at a time. Cache is shared safely between threads, so single
+    instance can be used by both `smartpost.Client` and `smartpost.sync.Client`.
+
+    With `snapshot_path`, cache is loaded from destinations snapshot on creation
+    and the snapshot is rewritten after every refresh, so other processes can
+    start with lists fetched by this one (even when SmartPost API is down).
+    Snapshot is written by background thread, refreshes that happen while it is
+    being written are saved together by the next write. Loaded lists are copied
+    into cache, only `DestinationSnapshot` itself shares snapshot pages.
+
+    Args:
+        ttl:
+            seconds entries are served without refresh.
+        snapshot_path:
+            optional path of destinations snapshot shared between processes.
+        snapshot_max_age:
+            lists in snapshot older than this number of seconds are not loaded.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 3600,
+        snapshot_path: Union[str, "os.PathLike[str]", None] = None,
+        snapshot_max_age: Optional[float] = None,
+    ) -> None:
+        self.ttl = ttl
+        self.snapshot_path = snapshot_path
+        #: Fresh entry was served
+        self.hits = 0
+        #: Stale entry was served while refresh was scheduled
+        self.stale_hits = 0
+        #: Nothing was cached, request was made
+        self.misses = 0
+        #: Refresh request returned 304 Not Modified
+        self.revalidations = 0
+        #: Background refresh failed, stale entry was kept
+        self.refresh_errors = 0
+        #: Snapshot could not be written
+        self.snapshot_errors = 0
+
+        self._entries: Dict[DestinationKey, DestinationCacheEntry] = {}
+        self._refreshing: Set[DestinationKey] = set()
+        self._lock = Lock()
+        # Cache changed after snapshot writer took its copy of entries
+        self._snapshot_pending = False
+        self._snapshot_writer: Optional[Thread] = None
+        if snapshot_path is not None and os.path.exists(snapshot_path):
+            # Snapshot of other version is replaced after the first refresh
+            with suppress(SnapshotError):
+                self.load_snapshot(snapshot_path, snapshot_max_age)
+
+    @staticmethod
+    def key(country: str, type: str, filter: str = "") -> DestinationKey:
+        return (country, type, filter)
+
+    def is_fresh(self, entry: DestinationCacheEntry) -> bool:
+        return monotonic() - entry.fetched_at < self.ttl
+
+    def lookup(self, key: DestinationKey) -> Optional[DestinationCacheEntry]:
+        """Returns cached entry (fresh or stale) and updates counters."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+            elif self.is_fresh(entry):
+                self.hits += 1
+            else:
+                self.stale_hits += 1
+
+            return entry
+
+    def peek(self, key: DestinationKey) -> Optional[DestinationCacheEntry]:
+        """Returns cached entry without touching counters."""
+        with self._lock:
+            return self._entries.get(key)
+
+    def store(self, key: DestinationKey, entry: DestinationCacheEntry) -> None:
+        with self._lock:
+            self._entries[key] = entry
+
+        self._write_snapshot()
+
+    def revalidated(self, key: DestinationKey) -> None:
+        """Marks entry as fresh again after 304 Not Modified response."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.fetched_at = monotonic()
+
+            self.revalidations += 1
+
+        self._write_snapshot()
+
+    def start_refresh(self, key: DestinationKey) -> bool:
+        """Returns True if caller should refresh entry (nobody else is doing it)."""
+        with self._lock:
+            if key in self._refreshing:
+                return False
+
+            self._refreshing.add(key)
+            return True
+
+    def finish_refresh(self, key: DestinationKey, failed: bool = False) -> None:
+        with self._lock:
+            self._refreshing.discard(key)
+            if failed:
+                self.refresh_errors += 1
+
+    def invalidate(self, key: Optional[DestinationKey] = None) -> None:
+        """Drops single entry or the whole cache if key is not specified."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "revalidations": self.revalidations,
+                "refresh_errors": self.refresh_errors,
+                "snapshot_errors": self.snapshot_errors,
+                "entries": len(self._entries),
+            }
+
+    def save_snapshot(self, path: Union[str, "os.PathLike[str]"]) -> None:
+        """Writes all cached lists to destinations snapshot (atomically)."""
+        now, wall_now = monotonic(), time()
+        with self._lock:
+            lists = [
+                SnapshotList(
+                    key=key,
+                    destinations=entry.destinations,
+                    etag=entry.etag,
+                    last_modified=entry.last_modified,
+                    fetched_at=wall_now - (now - entry.fetched_at),
+                )
+                for key, entry in self._entries.items()
+            ]
+
+        write_snapshot(path, lists)
+
+    def load_snapshot(
+        self, path: Union[str, "os.PathLike[str]"], max_age: Optional[float] = None
+    ) -> int:
+        """Loads lists from destinations snapshot, keeping their age.
+
+        Lists older than `ttl` are served as stale and refreshed in background.
+        Lists already in cache are not replaced. Destinations are copied from
+        snapshot, so it is not kept open.
+
+        Args:
+            path:
+                path of destinations snapshot.
+            max_age:
+                lists older than this number of seconds are skipped.
+
+        Returns:
+            Number of loaded lists.
+
+        Raises:
+            SnapshotError:
+                file can't be read (e.g. it is empty), is not a snapshot or was
+                written by incompatible version.
+        """
+        now, wall_now = monotonic(), time()
+        loaded = 0
+        with DestinationSnapshot(path) as snapshot:
+            for key, item in snapshot.lists.items():
+                age = max(wall_now - item.fetched_at, 0.0)
+                if max_age is not None and age >= max_age:
+                    continue
+
+                entry = DestinationCacheEntry(
+                    list(item.destinations),
+                    etag=item.etag,
+                    last_modified=item.last_modified,
+                    fetched_at=now - age,
+                )
+                with self._lock:
+                    if key not in self._entries:
+                        self._entries[key] = entry
+                        loaded += 1
+
+        return loaded
+
+    def flush_snapshot(self) -> None:
+        """Waits until scheduled snapshot writes are finished."""
+        while True:
+            with self._lock:
+                writer = self._snapshot_writer
+
+            if writer is None:
+                return
+
+            writer.join()
+
+    def _write_snapshot(self) -> None:
+        """Schedules snapshot write, so that callers don't wait for disk."""
+        if self.snapshot_path is None:
+            return
+
+        with self._lock:
+            self._snapshot_pending = True
+            if self._snapshot_writer is not None:
+                return
+
+            # Not daemon, so that the last write is finished before exit
+            self._snapshot_writer = Thread(
+                target=self._run_snapshot_writer, name="smartpost-snapshot"
+            )
+
+        self._snapshot_writer.start()
+
+    def _run_snapshot_writer(self) -> None:
+        while True:
+            with self._lock:
+                if not self._snapshot_pending or self.snapshot_path is None:
+                    self._snapshot_writer = None
+                    return
+
+                self._snapshot_pending = False
+
+            try:
+                self.save_snapshot(self.snapshot_path)
+            except Exception:  # noqa: PIE786 - writer must keep serving next writes
+                # Snapshot is an optimization, serving cached lists is more important
+                with self._lock:
+                    self.snapshot_errors += 1
+
+
+class LabelCache:
+    """Two-tier cache for labels PDF files - in-memory LRU and optional directory.
+
+    Labels are keyed by page format and barcodes, so reprints of the same labels
+    are served locally. Files on disk are named after hash of the key and are
+    evicted oldest first once their total size exceeds `max_disk_bytes`. Files
+    are tracked in memory (directory is scanned only on creation), other files
+    in `directory` are never touched. Cache is shared safely between threads,
+    disk is read and written outside of the lock.
+
+    Args:
+        max_entries:
+            maximum number of PDF files kept in memory.
+        directory:
+            optional directory for on-disk tier, it is created if missing.
+        max_disk_bytes:
+            maximum total size of PDF files kept in `directory`.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        directory: Union[str, "os.PathLike[str]", None] = None,
+        max_disk_bytes: int = 256 * 1024 * 1024,
+    ) -> None:
+        self.max_entries = max_entries
+        self.directory = os.fspath(directory) if directory is not None else None
+        self.max_disk_bytes = max_disk_bytes
+        #: PDF was served from memory
+        self.memory_hits = 0
+        #: PDF was served from disk
+        self.disk_hits = 0
+        #: Nothing was cached, request was made
+        self.misses = 0
+
+        self._memory: "OrderedDict[LabelKey, bytes]" = OrderedDict()
+        #: path -> size of files on disk, oldest first
+        self._files: "OrderedDict[str, int]" = OrderedDict()
+        self._disk_bytes = 0
+        self._lock = Lock()
+        if self.directory is not None:
+            os.makedirs(self.directory, exist_ok=True)
+            for path, size, _ in sorted(self._scan_disk(), key=lambda file: file[2]):
+                self._files[path] = size
+                self._disk_bytes += size
+
+    @staticmethod
+    def key(format: str, barcodes: Sequence[str]) -> LabelKey:
+        return (format, tuple(barcodes))
+
+    @property
+    def uses_disk(self) -> bool:
+        """Lookups and stores read or write files, async code runs them in executor."""
+        return self.directory is not None
+
+    def get(self, key: LabelKey) -> Optional[bytes]:
+        """Returns cached PDF file and updates counters."""
+        with self._lock:
+            pdf = self._memory.get(key)
+            if pdf is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return pdf
+
+        pdf = self._read_disk(key)
+        with self._lock:
+            if pdf is None:
+                self.misses += 1
+                return None
+
+            self.disk_hits += 1
+            self._remember(key, pdf)
+            return pdf
+
+    def store(self, key: LabelKey, pdf: bytes) -> None:
+        with self._lock:
+            self._remember(key, pdf)
+
+        self._write_disk(key, pdf)
+
+    def invalidate(self, key: Optional[LabelKey] = None) -> None:
+        """Drops single entry or the whole cache if key is not specified."""
+        with self._lock:
+            if key is None:
+                self._memory.clear()
+                paths = list(self._files)
+            else:
+                self._memory.pop(key, None)
+                key_path = self._path(key)
+                paths = [key_path] if key_path and key_path in self._files else []
+
+            for path in paths:
+                self._disk_bytes -= self._files.pop(path)
+
+        self._unlink(paths)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            requests = hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": hits / requests if requests else 0.0,
+                "entries": len(self._memory),
+                "disk_bytes": self._disk_bytes,
+            }
+
+    def _remember(self, key: LabelKey, pdf: bytes) -> None:
+        self._memory[key] = pdf
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _path(self, key: LabelKey) -> Optional[str]:
+        if self.directory is None:
+            return None
+
+        format, barcodes = key
+        digest = sha256("\n".join((format, *barcodes)).encode()).hexdigest()
+        return os.path.join(self.directory, f"{digest}.pdf")
+
+    def _read_disk(self, key: LabelKey) -> Optional[bytes]:
+        path = self._path(key)
+        if path is None:
+            return None
+
+        try:
+            with open(path, "rb") as file:
+                return file.read()
+        except FileNotFoundError:
+            return None
+
+    def _write_disk(self, key: LabelKey, pdf: bytes) -> None:
+        path = self._path(key)
+        if path is None or len(pdf) > self.max_disk_bytes:
+            return
+
+        # Readers never see partially written file
+        temporary_path = f"{path}.{os.getpid()}.{get_ident()}.tmp"
+        with open(temporary_path, "wb") as file:
+            file.write(pdf)
+
+        os.replace(temporary_path, path)
+        evicted = []
+        with self._lock:
+            self._disk_bytes += len(pdf) - self._files.pop(path, 0)
+            self._files[path] = len(pdf)
+            while self._disk_bytes > self.max_disk_bytes:
+                evicted_path, size = self._files.popitem(last=False)
+                self._disk_bytes -= size
+                evicted.append(evicted_path)
+
+        self._unlink(evicted)
+
+    @staticmethod
+    def _unlink(paths: List[str]) -> None:
+        for path in paths:
+            # File could be removed by other process sharing the directory
+            with suppress(FileNotFoundError):
+                os.unlink(path)
+
+    def _scan_disk(self) -> List[Tuple[str, int, float]]:
+        """Returns (path, size, modification time) of PDF files written by cache."""
+        if self.directory is None:
+            return []
+
+        files = []
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.is_file() and _LABEL_FILE.fullmatch(entry.name):
+                    stat = entry.stat()
+                    files.append((entry.path, stat.st_size, stat.st_mtime))
+
+        return files
@@ -0,0 +1,372 @@
+from dataclasses import dataclass, field
+from typing import (
+    TYPE_CHECKING,
+    AsyncIterable,
+    AsyncIterator,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+    Union,
+)
+
+from smartpost.errors import (
+    IncompleteShipmentError,
+    ShipmentOrderBatchError,
+    ShipmentOrderError,
+    ShipmentOrderErrorDetails,
+    match_order_errors,
+)
+from smartpost.metrics import NULL_MEASUREMENT, Measurement
+from smartpost.models import OrderInfo, ShipmentOrder, encode_xml
+
+if TYPE_CHECKING:
+    import asyncio
+    import concurrent.futures
+
+T = TypeVar("T")
+#: Finished chunk of `LabelsPipeline` (asyncio task or thread pool future)
+ChunkOutcome = Union[
+    "asyncio.Future[Optional[bytes]]", "concurrent.futures.Future[Optional[bytes]]"
+]
+
+#: Streamed orders are encoded into request body chunks of about this size
+BODY_CHUNK_SIZE = 64 * 1024
+
+
+def chunked(items: Sequence[T], size: int) -> List[Sequence[T]]:
+    """Splits items into chunks of `size` elements (last one can be smaller)."""
+    if size < 1:
+        raise ValueError(f"Chunk size must be positive, got {size}")
+
+    chunks = []
+    for start in range(0, len(items), size):
+        end = start + size
+        chunks.append(items[start:end])
+
+    return chunks
+
+
+def iter_chunks(items: Iterable[T], size: int) -> Iterator[List[T]]:
+    """Same as `chunked`, but for iterables that are consumed lazily."""
+    if size < 1:
+        raise ValueError(f"Chunk size must be positive, got {size}")
+
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+
+    if chunk:
+        yield chunk
+
+
+async def aiter_chunks(
+    items: Union[Iterable[T], AsyncIterable[T]], size: int
+) -> AsyncIterator[List[T]]:
+    """Same as `iter_chunks`, but also accepts async iterables."""
+    if not isinstance(items, AsyncIterable):
+        for chunk in iter_chunks(items, size):
+            yield chunk
+
+        return
+
+    if size < 1:
+        raise ValueError(f"Chunk size must be positive, got {size}")
+
+    batch = []
+    async for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+
+    if batch:
+        yield batch
+
+
+class _BodyChunks:
+    """Collects encoded orders into request body chunks."""
+
+    def __init__(self, measurement: Measurement, chunk_size: int) -> None:
+        self.measurement = measurement
+        self.chunk_size = chunk_size
+        self._parts: List[str] = []
+        self._size = 0
+
+    def add(self, part: str) -> Optional[bytes]:
+        """Returns chunk once enough parts are collected."""
+        self._parts.append(part)
+        self._size += len(part)
+        if self._size < self.chunk_size:
+            return None
+
+        return self.flush()
+
+    def flush(self) -> bytes:
+        chunk = encode_xml("".join(self._parts))
+        self._parts = []
+        self._size = 0
+        self.measurement.sent(len(chunk))
+        return chunk
+
+
+def iter_orders_body(
+    start: str,
+    shipment_orders: Iterable[ShipmentOrder],
+    end: str,
+    measurement: Measurement = NULL_MEASUREMENT,
+    chunk_size: int = BODY_CHUNK_SIZE,
+) -> Iterator[bytes]:
+    """Encodes shipment orders document incrementally, order by order.
+
+    Only one chunk of the document is kept in memory, so orders can come
+    straight from database cursor or other generator.
+    """
+    chunks = _BodyChunks(measurement, chunk_size)
+    chunks.add(start)
+    for order in shipment_orders:
+        measurement.count(1)
+        chunk = chunks.add(order.to_xml_string())
+        if chunk is not None:
+            yield chunk
+
+    chunks.add(end)
+    yield chunks.flush()
+
+
+async def aiter_orders_body(
+    start: str,
+    shipment_orders: Union[Iterable[ShipmentOrder], AsyncIterable[ShipmentOrder]],
+    end: str,
+    measurement: Measurement = NULL_MEASUREMENT,
+    chunk_size: int = BODY_CHUNK_SIZE,
+) -> AsyncIterator[bytes]:
+    """Same as `iter_orders_body`, but also accepts async iterables of orders."""
+    if not isinstance(shipment_orders, AsyncIterable):
+        for body in iter_orders_body(
+            start, shipment_orders, end, measurement, chunk_size
+        ):
+            yield body
+
+        return
+
+    chunks = _BodyChunks(measurement, chunk_size)
+    chunks.add(start)
+    async for order in shipment_orders:
+        measurement.count(1)
+        chunk = chunks.add(order.to_xml_string())
+        if chunk is not None:
+            yield chunk
+
+    chunks.add(end)
+    yield chunks.flush()
+
+
+def chunks_error(
+    chunk_sizes: Sequence[int],
+    added: Dict[int, List[OrderInfo]],
+    errors: Dict[int, Exception],
+) -> Exception:
+    """Creates error for failed chunks that carries `OrderInfo` of added ones.
+
+    Args:
+        chunk_sizes:
+            number of orders in every chunk, in input order.
+        added:
+            `OrderInfo` lists of added chunks by chunk index.
+        errors:
+            errors of failed chunks by chunk index.
+
+    Returns:
+        `ShipmentOrderBatchError` if SmartPost API rejected all failed chunks,
+        `IncompleteShipmentError` otherwise.
+    """
+    orders_info: List[Optional[OrderInfo]] = []
+    for index, size in enumerate(chunk_sizes):
+        chunk_info = added.get(index)
+        orders_info.extend([None] * size if chunk_info is None else chunk_info)
+
+    chunk_errors = [errors[index] for index in sorted(errors)]
+    api_errors = [
+        error for error in chunk_errors if isinstance(error, ShipmentOrderError)
+    ]
+    if len(api_errors) == len(chunk_errors):
+        return ShipmentOrderBatchError(api_errors, orders_info)
+
+    return IncompleteShipmentError(chunk_errors, orders_info)
+
+
+def merge_chunk_results(
+    chunks: Sequence[Sequence[ShipmentOrder]],
+    results: Sequence[Union[List[OrderInfo], BaseException]],
+) -> List[OrderInfo]:
+    """Merges results of shipment order chunks, keeping orders in input order.
+
+    Raises:
+        ShipmentOrderBatchError:
+            SmartPost API rejected some of the chunks.
+        IncompleteShipmentError:
+            some of the chunks failed for other reasons (e.g. network issue).
+    """
+    added: Dict[int, List[OrderInfo]] = {}
+    errors: Dict[int, Exception] = {}
+    for index, result in enumerate(results):
+        if isinstance(result, Exception):
+            errors[index] = result
+        elif isinstance(result, BaseException):
+            # Cancellation and interpreter exit are not chunk failures
+            raise result
+        else:
+            added[index] = result
+
+    if errors:
+        raise chunks_error([len(chunk) for chunk in chunks], added, errors)
+
+    return [info for chunk_info in added.values() for info in chunk_info]
+
+
+class LabelsPipeline:
+    """Bookkeeping of chunks in `add_shipment_orders_with_labels`.
+
+    Shared by async and sync clients, they only differ in how chunks are run.
+    """
+
+    def __init__(self) -> None:
+        self.chunk_sizes: List[int] = []
+        #: `OrderInfo` lists of chunks whose orders were added, by chunk index
+        self.added: Dict[int, List[OrderInfo]] = {}
+        self.errors: Dict[int, Exception] = {}
+        #: Chunk failed, chunks that were not sent yet are skipped
+        self.stopped = False
+        #: Caller stopped iterating, labels are not requested either
+        self.closed = False
+
+    def add(self, chunk: Sequence[ShipmentOrder]) -> int:
+        """Registers chunk, returns its index."""
+        self.chunk_sizes.append(len(chunk))
+        return len(self.chunk_sizes) - 1
+
+    def completed(
+        self, index: int, outcome: "ChunkOutcome"
+    ) -> Optional[Tuple[List[OrderInfo], bytes]]:
+        """Records finished chunk, returns (`OrderInfo` list, PDF) if it succeeded.
+
+        Chunk result is labels PDF file, or `None` if chunk was skipped.
+        """
+        error = outcome.exception()
+        if isinstance(error, Exception):
+            self.errors[index] = error
+            self.stopped = True
+            return None
+
+        if error is not None:
+            # Cancellation and interpreter exit are not chunk failures
+            raise error
+
+        pdf = outcome.result()
+        return None if pdf is None else (self.added[index], pdf)
+
+    def raise_for_errors(self) -> None:
+        """Raises error that carries `OrderInfo` of added chunks if any chunk failed.
+
+        Raises:
+            ShipmentOrderBatchError:
+                SmartPost API rejected orders of failed chunks.
+            IncompleteShipmentError:
+                some chunks failed for other reasons (e.g. labels request).
+        """
+        if self.errors:
+            raise chunks_error(self.chunk_sizes, self.added, self.errors)
+
+
+@dataclass
+class RejectedOrder:
+    """Shipment order that was rejected, with reasons."""
+
+    #: Index of order in `shipment_orders` passed to client
+    index: int
+    order: ShipmentOrder
+    errors: List[ShipmentOrderErrorDetails]
+
+
+@dataclass
+class PartialShipmentResult:
+    """Result of adding shipment orders when invalid ones are left out."""
+
+    #: Same length and order as `shipment_orders`, `None` for rejected orders
+    orders_info: List[Optional[OrderInfo]] = field(default_factory=list)
+    rejected: List[RejectedOrder] = field(default_factory=list)
+
+    @property
+    def added(self) -> List[OrderInfo]:
+        return [info for info in self.orders_info if info is not None]
+
+
+class PartialShipment:
+    """Keeps track of orders while invalid ones are left out of resubmissions.
+
+    Both `smartpost.Client` and `smartpost.sync.Client` send `pending` orders,
+    pass result to `added` or error to `rejected` and repeat while anything
+    is pending.
+    """
+
+    def __init__(
+        self,
+        shipment_orders: Sequence[ShipmentOrder],
+        invalid: Optional[Dict[int, List[ShipmentOrderErrorDetails]]] = None,
+    ) -> None:
+        self.shipment_orders = shipment_orders
+        self._result = PartialShipmentResult([None] * len(shipment_orders))
+        invalid = invalid or {}
+        for index, errors in invalid.items():
+            self._reject(index, errors)
+
+        #: Indexes of orders that were not sent yet
+        self.indexes = [i for i in range(len(shipment_orders)) if i not in invalid]
+
+    @property
+    def result(self) -> PartialShipmentResult:
+        self._result.rejected.sort(key=lambda rejected: rejected.index)
+        return self._result
+
+    @property
+    def pending(self) -> List[ShipmentOrder]:
+        return [self.shipment_orders[index] for index in self.indexes]
+
+    def added(self, orders_info: Sequence[OrderInfo]) -> None:
+        for index, info in zip(self.indexes, orders_info):
+            self._result.orders_info[index] = info
+
+        self.indexes = []
+
+    def rejected(self, exc: ShipmentOrderError) -> None:
+        """Leaves out orders that error details point to.
+
+        Raises:
+            ShipmentOrderError:
+                given error, when some of its details do not match any order
+                (it is not known which orders are wrong).
+        """
+        matched, unmatched = match_order_errors(self.pending, exc.errors)
+        if unmatched or not matched:
+            raise exc
+
+        for position, errors in matched.items():
+            self._reject(self.indexes[position], errors)
+
+        self.indexes = [
+            index
+            for position, index in enumerate(self.indexes)
+            if position not in matched
+        ]
+
+    def _reject(self, index: int, errors: List[ShipmentOrderErrorDetails]) -> None:
+        order = self.shipment_orders[index]
+        self._result.rejected.append(RejectedOrder(index, order, errors))
@@ -0,0 +1,127 @@
+from dataclasses import dataclass, field, fields
+from threading import Lock
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+from smartpost.models import Destination
+
+_FIELDS = tuple(f.name for f in fields(Destination))
+
+
+@dataclass
+class DestinationChange:
+    """Destination that is present in both lists, but with different values."""
+
+    old: Destination
+    new: Destination
+    #: Names of fields that differ, in `Destination` field order
+    fields: Tuple[str, ...]
+
+    @property
+    def place_id(self) -> int:
+        return self.new.place_id
+
+    @property
+    def changes(self) -> Dict[str, Tuple[Any, Any]]:
+        """Returns {field name: (old value, new value)} for changed fields."""
+        return {
+            name: (getattr(self.old, name), getattr(self.new, name))
+            for name in self.fields
+        }
+
+
+@dataclass
+class DestinationDiff:
+    """Difference between two destination lists, matched by `place_id`."""
+
+    added: List[Destination] = field(default_factory=list)
+    removed: List[Destination] = field(default_factory=list)
+    changed: List[DestinationChange] = field(default_factory=list)
+    #: Number of destinations that are the same in both lists
+    unchanged: int = 0
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.changed)
+
+
+def diff_destinations(
+    old: Iterable[Destination], new: Iterable[Destination]
+) -> DestinationDiff:
+    """Compares previous destination list with refreshed one.
+
+    Destinations are matched by `place_id`, `added` and `changed` keep order of
+    `new` list, `removed` keeps order of `old` one.
+    """
+    previous = {destination.place_id: destination for destination in old}
+    diff = DestinationDiff()
+    for destination in new:
+        before = previous.pop(destination.place_id, None)
+        if before is None:
+            diff.added.append(destination)
+        elif before == destination:
+            diff.unchanged += 1
+        else:
+            changed = tuple(
+                name
+                for name in _FIELDS
+                if getattr(before, name) != getattr(destination, name)
+            )
+            diff.changed.append(DestinationChange(before, destination, changed))
+
+    diff.removed.extend(previous.values())
+    return diff
+
+
+DiffCallback = Callable[[DestinationDiff], None]
+
+
+class DestinationTracker:
+    """Remembers the last destination list and reports what changed in refreshes.
+
+    Pass every refreshed list (e.g. result of `Client.get_ee_terminals`) to
+    `update`, registered callbacks are called only when something changed, so
+    downstream structures (indexes, database rows, map tiles) are updated
+    incrementally and most refreshes cost a single comparison pass.
+
+    Args:
+        destinations:
+            initial destination list, changes are reported relative to it.
+    """
+
+    def __init__(self, destinations: Iterable[Destination] = ()) -> None:
+        self._destinations = {d.place_id: d for d in destinations}
+        self._callbacks: List[DiffCallback] = []
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._destinations)
+
+    @property
+    def destinations(self) -> List[Destination]:
+        """Last destination list passed to `update`."""
+        return list(self._destinations.values())
+
+    def on_change(self, callback: DiffCallback) -> DiffCallback:
+        """Registers callback, can be used as decorator."""
+        self._callbacks.append(callback)
+        return callback
+
+    def remove_callback(self, callback: DiffCallback) -> None:
+        self._callbacks.remove(callback)
+
+    def update(self, destinations: Iterable[Destination]) -> DestinationDiff:
+        """Compares refreshed list with the last one and notifies callbacks.
+
+        Callbacks are called in registration order, after tracker has already
+        switched to the refreshed list. Exception raised by callback is
+        propagated and the rest of the callbacks are not called.
+        """
+        with self._lock:
+            destinations = list(destinations)
+            diff = diff_destinations(self._destinations.values(), destinations)
+            self._destinations = {d.place_id: d for d in destinations}
+
+        if diff:
+            for callback in list(self._callbacks):
+                callback(diff)
+
+        return diff
@@ -1,4 +1,6 @@
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from smartpost.models import OrderInfo, ShipmentOrder
 
 errors_explanation: Dict[str, str] = {
     "000": "Destination info missing",
@@ -55,6 +57,58 @@ class ShipmentOrderError(Exception):
             ShipmentOrderErrorDetails(item) for item in errors["orders"]["item"]
         ]
 
+    @classmethod
+    def from_details(
+        cls, errors: List[ShipmentOrderErrorDetails]
+    ) -> "ShipmentOrderError":
+        """Creates error from already parsed details (e.g. subset of other error)."""
+        error = cls.__new__(cls, errors)
+        error.errors = errors
+        return error
+
+
+class ShipmentOrderBatchError(ShipmentOrderError):
+    """Error that is raised when some chunks of shipment orders were rejected.
+
+    Orders from other chunks were added, `orders_info` keeps input order and has
+    `None` in place of every order from rejected chunks.
+    """
+
+    def __init__(
+        self,
+        chunk_errors: List[ShipmentOrderError],
+        orders_info: List[Optional[OrderInfo]],
+    ) -> None:
+        self.chunk_errors = chunk_errors
+        self.orders_info = orders_info
+        self.errors: List[ShipmentOrderErrorDetails] = [
+            details for error in chunk_errors for details in error.errors
+        ]
+
+
+class IncompleteShipmentError(Exception):
+    """Error that is raised when some chunks of shipment orders failed without
+    SmartPost API verdict (e.g. network issue or open circuit breaker).
+
+    Orders from other chunks were added, `orders_info` keeps input order and has
+    `None` in place of every order from failed chunks - those may or may not be
+    added, check them before sending again. `chunk_errors` keeps errors of all
+    failed chunks, including ones rejected by SmartPost API.
+    """
+
+    def __init__(
+        self,
+        chunk_errors: List[Exception],
+        orders_info: List[Optional[OrderInfo]],
+    ) -> None:
+        super().__init__(
+            f"{len(chunk_errors)} chunk(s) of shipment orders failed, "
+            f"first error: {chunk_errors[0]!r}"
+        )
+        self.chunk_errors = chunk_errors
+        self.orders_info = orders_info
+        self.__cause__ = chunk_errors[0]
+
 
 class ShipmentLabelsError(Exception):  # noqa: B903
     """Error that is raised when there are issues with shipment labels (PDF)."""
@@ -62,3 +116,53 @@ class ShipmentLabelsError(Exception):  # noqa: B903
     def __init__(self, body: bytes, status_code: int) -> None:
         self.body = body
         self.status_code = status_code
+
+
+class CircuitOpenError(Exception):
+    """Error that is raised when request is rejected by open circuit breaker."""
+
+    def __init__(self, retry_after: float) -> None:
+        super().__init__(f"Circuit breaker is open, retry after {retry_after:.2f}s")
+        #: Seconds until circuit breaker lets probe request through
+        self.retry_after = retry_after
+
+
+class SnapshotError(Exception):
+    """Error that is raised when snapshot file is malformed or has other version."""
+
+
+def match_order_errors(
+    shipment_orders: Sequence[ShipmentOrder],
+    errors: List[ShipmentOrderErrorDetails],
+) -> Tuple[Dict[int, List[ShipmentOrderErrorDetails]], List[ShipmentOrderErrorDetails]]:
+    """Maps error details back to orders they belong to.
+
+    Details are matched by barcode first and by reference if barcode is missing.
+
+    Returns:
+        A tuple with dict that maps indexes in `shipment_orders` to their error
+        details, and a list of details that did not match any order.
+    """
+    by_barcode: Dict[str, List[int]] = {}
+    by_reference: Dict[str, List[int]] = {}
+    for index, order in enumerate(shipment_orders):
+        if order.barcode:
+            by_barcode.setdefault(order.barcode, []).append(index)
+
+        if order.reference:
+            by_reference.setdefault(order.reference, []).append(index)
+
+    matched: Dict[int, List[ShipmentOrderErrorDetails]] = {}
+    unmatched: List[ShipmentOrderErrorDetails] = []
+    for details in errors:
+        indexes = (details.barcode and by_barcode.get(details.barcode)) or (
+            details.reference and by_reference.get(details.reference)
+        )
+        if not indexes:
+            unmatched.append(details)
+            continue
+
+        for index in indexes:
+            matched.setdefault(index, []).append(details)
+
+    return matched, unmatched
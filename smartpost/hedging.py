@@ -0,0 +1,113 @@
+from asyncio import FIRST_COMPLETED, Task, ensure_future, wait
+from collections import deque
+from time import monotonic
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Set, TypeVar
+
+from smartpost.resilience import RetryBudget
+
+T = TypeVar("T")
+
+
+class HedgingPolicy:
+    """Sends second identical request when the first one is slower than usual.
+
+    If response does not arrive within `delay` seconds, the same request is sent
+    again (with HTTP/2 it is just another stream on the same connection) and the
+    first response to arrive wins, the other request is cancelled. Hedged requests
+    are limited to `max_hedge_ratio` of all requests, so load on SmartPost API
+    stays bounded even when it is slow for everyone.
+
+    Args:
+        delay:
+            fixed number of seconds to wait before hedging. When not set, delay
+            is `percentile` of recently observed latencies (`initial_delay`
+            until `min_samples` latencies are observed).
+        percentile:
+            percentile of observed latencies used as adaptive delay.
+        initial_delay:
+            delay used while there are not enough observed latencies.
+        min_delay:
+            lower bound for adaptive delay.
+        max_hedge_ratio:
+            maximum ratio of hedged requests to all requests.
+        window:
+            number of recent latencies adaptive delay is based on.
+        min_samples:
+            number of observed latencies required for adaptive delay.
+    """
+
+    def __init__(
+        self,
+        delay: Optional[float] = None,
+        *,
+        percentile: float = 0.95,
+        initial_delay: float = 1.0,
+        min_delay: float = 0.05,
+        max_hedge_ratio: float = 0.1,
+        window: int = 200,
+        min_samples: int = 20,
+    ) -> None:
+        self.fixed_delay = delay
+        self.percentile = percentile
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        #: Requests sent through policy
+        self.requests = 0
+        #: Hedged requests sent
+        self.hedges = 0
+        #: Hedged requests that were faster than original ones
+        self.hedge_wins = 0
+        self._budget = RetryBudget(ratio=max_hedge_ratio, min_tokens=1, max_tokens=10)
+        self._latencies: Deque[float] = deque(maxlen=window)
+
+    @property
+    def delay(self) -> float:
+        """Seconds to wait for response before sending hedged request."""
+        if self.fixed_delay is not None:
+            return self.fixed_delay
+
+        if len(self._latencies) < self.min_samples:
+            return self.initial_delay
+
+        latencies = sorted(self._latencies)
+        index = int(self.percentile * (len(latencies) - 1))
+        return max(latencies[index], self.min_delay)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "delay": self.delay,
+        }
+
+    async def run(self, factory: Callable[[], Awaitable[T]]) -> T:
+        """Runs request, hedging it if it is slow and hedge budget allows."""
+        self.requests += 1
+        self._budget.deposit()
+        started = monotonic()
+        first: "Task[T]" = ensure_future(factory())
+        tasks: Set["Task[T]"] = {first}
+        try:
+            done, _ = await wait(tasks, timeout=self.delay)
+            if not done and self._budget.withdraw():
+                self.hedges += 1
+                tasks.add(ensure_future(factory()))
+
+            while True:
+                done, tasks = await wait(tasks, return_when=FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not first:
+                            self.hedge_wins += 1
+
+                        self._latencies.append(monotonic() - started)
+                        return task.result()
+
+                if not tasks:
+                    # Every request failed, error of the last one is raised
+                    return done.pop().result()
+        finally:
+            for task in tasks:
+                task.cancel()
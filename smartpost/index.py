@@ -0,0 +1,279 @@
+from heapq import heappush, heappushpop
+from math import asin, ceil, cos, floor, radians, sin, sqrt
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from smartpost.diff import DestinationDiff
+from smartpost.models import Destination
+
+#: Mean Earth radius in kilometers
+EARTH_RADIUS_KM = 6371.0088
+
+Vector = Tuple[float, float, float]
+Cell = Tuple[int, int, int]
+Bucket = Dict[int, Tuple[Destination, Vector]]
+
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Great-circle distance between two points in kilometers."""
+    d_lat = radians(lat2 - lat1)
+    d_lng = radians(lng2 - lng1)
+    lat_term = sin(d_lat / 2) ** 2
+    lng_term = cos(radians(lat1)) * cos(radians(lat2)) * sin(d_lng / 2) ** 2
+    a = lat_term + lng_term
+    return 2 * EARTH_RADIUS_KM * asin(min(1.0, sqrt(a)))
+
+
+def _to_vector(lat: float, lng: float) -> Vector:
+    """Converts coordinates to point on unit sphere."""
+    lat_r, lng_r = radians(lat), radians(lng)
+    return (cos(lat_r) * cos(lng_r), cos(lat_r) * sin(lng_r), sin(lat_r))
+
+
+def _chord_to_km(chord: float) -> float:
+    return 2 * EARTH_RADIUS_KM * asin(min(1.0, chord / 2))
+
+
+def _km_to_chord(km: float) -> float:
+    return 2 * sin(min(km / EARTH_RADIUS_KM, 3.141592653589793) / 2)
+
+
+def _distance_sq(a: Vector, b: Vector) -> float:
+    dx = a[0] - b[0]
+    dy = a[1] - b[1]
+    dz = a[2] - b[2]
+    return dx * dx + dy * dy + dz * dz
+
+
+def _shell(radius: int) -> Iterator[Cell]:
+    """Yields cell offsets lying exactly `radius` cells away (Chebyshev)."""
+    if radius == 0:
+        yield (0, 0, 0)
+        return
+
+    full = range(-radius, radius + 1)
+    for dx in full:
+        for dy in full:
+            if abs(dx) == radius or abs(dy) == radius:
+                for dz in full:
+                    yield (dx, dy, dz)
+            else:
+                yield (dx, dy, -radius)
+                yield (dx, dy, radius)
+
+
+class DestinationIndex:
+    """Spatial index for nearest destination lookups.
+
+    Destinations are placed on the unit sphere and bucketed into uniform 3D grid
+    cells, so distance bounds are exact everywhere (no issues near meridian or
+    poles) and lookups only touch cells around query point.
+
+    Args:
+        destinations:
+            destinations to index, usually result of `Client.get_*_terminals`.
+        cell_km:
+            grid cell size in kilometers, should be close to typical
+            distance between neighbouring destinations.
+    """
+
+    def __init__(
+        self, destinations: Iterable[Destination] = (), *, cell_km: float = 20.0
+    ) -> None:
+        self._cell = _km_to_chord(cell_km)
+        self._entries: Dict[int, Tuple[Destination, Vector, Cell]] = {}
+        self._cells: Dict[Cell, Bucket] = {}
+        for destination in destinations:
+            self.add(destination)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, place_id: object) -> bool:
+        return place_id in self._entries
+
+    def __iter__(self) -> Iterator[Destination]:
+        return (destination for destination, _, _ in self._entries.values())
+
+    def get(self, place_id: int) -> Optional[Destination]:
+        entry = self._entries.get(place_id)
+        return entry[0] if entry else None
+
+    def add(self, destination: Destination) -> None:
+        """Adds destination, replacing one with the same `place_id`."""
+        self.remove(destination.place_id)
+        vector = _to_vector(destination.lat, destination.lng)
+        cell = self._cell_of(vector)
+        self._entries[destination.place_id] = (destination, vector, cell)
+        self._cells.setdefault(cell, {})[destination.place_id] = (destination, vector)
+
+    def remove(self, place_id: int) -> None:
+        entry = self._entries.pop(place_id, None)
+        if entry is None:
+            return
+
+        cell = entry[2]
+        bucket = self._cells[cell]
+        del bucket[place_id]
+        if not bucket:
+            del self._cells[cell]
+
+    def update(self, destinations: Iterable[Destination]) -> None:
+        """Brings index in sync with refreshed destination list.
+
+        Only destinations that were added, removed or changed are touched,
+        unchanged ones stay in place.
+        """
+        seen = set()
+        for destination in destinations:
+            seen.add(destination.place_id)
+            entry = self._entries.get(destination.place_id)
+            if entry is None or entry[0] != destination:
+                self.add(destination)
+
+        for place_id in [
+            place_id for place_id in self._entries if place_id not in seen
+        ]:
+            self.remove(place_id)
+
+    def apply(self, diff: DestinationDiff) -> None:
+        """Applies changes reported by `DestinationTracker` or `diff_destinations`."""
+        for destination in diff.removed:
+            self.remove(destination.place_id)
+
+        for destination in diff.added:
+            self.add(destination)
+
+        for change in diff.changed:
+            self.add(change.new)
+
+    def nearest(
+        self, lat: float, lng: float, k: int = 1
+    ) -> List[Tuple[Destination, float]]:
+        """Finds `k` destinations closest to given point.
+
+        Returns:
+            A list of (destination, distance in km) pairs, closest first.
+        """
+        if k <= 0 or not self._entries:
+            return []
+
+        query = _to_vector(lat, lng)
+        origin = self._cell_of(query)
+        # Max-heap of (-squared chord, place_id) with k best candidates
+        best: List[Tuple[float, int]] = []
+        visited = 0
+        radius = 0
+        while visited < len(self._entries):
+            if self._shell_size(radius) > len(self._cells):
+                # Sparse grid, it's cheaper to check remaining cells directly
+                for bucket in self._buckets_beyond(origin, radius):
+                    self._collect(best, k, query, bucket)
+
+                break
+
+            for bucket in self._shell_buckets(origin, radius):
+                visited += len(bucket)
+                self._collect(best, k, query, bucket)
+
+            # Points in further cells are at least `radius` cells away
+            if len(best) == k and -best[0][0] <= (radius * self._cell) ** 2:
+                break
+
+            radius += 1
+
+        found = sorted((-neg, place_id) for neg, place_id in best)
+        return [
+            (self._entries[place_id][0], _chord_to_km(sqrt(chord_sq)))
+            for chord_sq, place_id in found
+        ]
+
+    def within(
+        self, lat: float, lng: float, radius_km: float
+    ) -> List[Tuple[Destination, float]]:
+        """Finds all destinations within `radius_km` from given point.
+
+        Returns:
+            A list of (destination, distance in km) pairs, closest first.
+        """
+        query = _to_vector(lat, lng)
+        origin = self._cell_of(query)
+        limit = _km_to_chord(radius_km)
+        reach = ceil(limit / self._cell)
+        limit_sq = limit * limit
+        found = []
+        for bucket in self._buckets_within(origin, reach):
+            for destination, vector in bucket.values():
+                chord_sq = _distance_sq(query, vector)
+                if chord_sq <= limit_sq:
+                    found.append((chord_sq, destination.place_id, destination))
+
+        found.sort(key=lambda item: (item[0], item[1]))
+        return [
+            (destination, _chord_to_km(sqrt(chord_sq)))
+            for chord_sq, _, destination in found
+        ]
+
+    def _shell_buckets(self, origin: Cell, radius: int) -> List[Bucket]:
+        """Returns non-empty buckets exactly `radius` cells away from origin."""
+        buckets = []
+        for dx, dy, dz in _shell(radius):
+            bucket = self._cells.get((origin[0] + dx, origin[1] + dy, origin[2] + dz))
+            if bucket:
+                buckets.append(bucket)
+
+        return buckets
+
+    def _buckets_beyond(self, origin: Cell, radius: int) -> List[Bucket]:
+        """Returns buckets at least `radius` cells away from origin."""
+        return [
+            bucket
+            for cell, bucket in self._cells.items()
+            if self._cell_distance(cell, origin) >= radius
+        ]
+
+    def _buckets_within(self, origin: Cell, reach: int) -> List[Bucket]:
+        """Returns buckets at most `reach` cells away from origin."""
+        if (2 * reach + 1) ** 3 > len(self._cells):
+            # Sparse grid, it's cheaper to check every cell
+            return [
+                bucket
+                for cell, bucket in self._cells.items()
+                if self._cell_distance(cell, origin) <= reach
+            ]
+
+        buckets = []
+        for radius in range(reach + 1):
+            buckets.extend(self._shell_buckets(origin, radius))
+
+        return buckets
+
+    def _cell_of(self, vector: Vector) -> Cell:
+        return (
+            floor(vector[0] / self._cell),
+            floor(vector[1] / self._cell),
+            floor(vector[2] / self._cell),
+        )
+
+    @staticmethod
+    def _cell_distance(cell: Cell, origin: Cell) -> int:
+        return max(
+            abs(cell[0] - origin[0]), abs(cell[1] - origin[1]), abs(cell[2] - origin[2])
+        )
+
+    @staticmethod
+    def _shell_size(radius: int) -> int:
+        return (2 * radius + 1) ** 3 - (2 * radius - 1) ** 3 if radius else 1
+
+    @staticmethod
+    def _collect(
+        best: List[Tuple[float, int]],
+        k: int,
+        query: Vector,
+        bucket: Bucket,
+    ) -> None:
+        for place_id, (_, vector) in bucket.items():
+            candidate = (-_distance_sq(query, vector), place_id)
+            if len(best) < k:
+                heappush(best, candidate)
+            elif candidate > best[0]:
+                heappushpop(best, candidate)
@@ -0,0 +1,374 @@
+import asyncio
+from collections import deque
+from threading import Event, Lock
+from time import monotonic, sleep
+from types import TracebackType
+from typing import (
+    Any,
+    AsyncContextManager,
+    Awaitable,
+    Callable,
+    ContextManager,
+    Deque,
+    Dict,
+    Optional,
+    Type,
+    TypeVar,
+)
+
+from httpx import Response, TransportError
+
+T = TypeVar("T")
+
+
+class TokenBucket:
+    """Rate limit of `rate` requests per second with bursts up to `burst` requests.
+
+    Tokens are reserved in advance, so concurrent callers are spaced evenly
+    instead of all waking up at once when tokens are refilled.
+    """
+
+    def __init__(self, rate: float, burst: Optional[int] = None) -> None:
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1, int(rate))
+        self._tokens = float(self.burst)
+        self._updated_at = monotonic()
+        self._lock = Lock()
+
+    def reserve(self) -> float:
+        """Takes a token and returns seconds to wait until it becomes valid."""
+        with self._lock:
+            now = monotonic()
+            elapsed = now - self._updated_at
+            self._tokens = min(self._tokens + elapsed * self.rate, self.burst)
+            self._updated_at = now
+            self._tokens -= 1
+            return -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+
+class _Waiter:
+    """Queued request, woken up from any thread or event loop."""
+
+    __slots__ = ("future", "loop", "event")
+
+    def __init__(self, asynchronous: bool) -> None:
+        self.event: Optional[Event] = None
+        self.future: Optional["asyncio.Future[None]"] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        if asynchronous:
+            self.loop = asyncio.get_running_loop()
+            self.future = self.loop.create_future()
+        else:
+            self.event = Event()
+
+    def wake(self) -> None:
+        if self.event is not None:
+            self.event.set()
+        elif self.loop is not None:
+            self.loop.call_soon_threadsafe(self._set_result)
+
+    def _set_result(self) -> None:
+        if self.future is not None and not self.future.done():
+            self.future.set_result(None)
+
+
+class AdaptiveLimiter:
+    """Limits rate and concurrency of requests, adapting to SmartPost API health.
+
+    Concurrency limit follows AIMD: it grows by one per `limit` successful
+    requests, and is multiplied by `backoff_ratio` (at most once per
+    `backoff_interval` seconds) when request fails with 429 or 5xx response,
+    network error, or is slower than `latency_threshold`. Requests over the
+    limit wait in FIFO queue, time spent there is exposed with `stats`.
+    Limiter can be shared by many clients, including sync ones.
+
+    Args:
+        rate:
+            optional maximum number of requests per second.
+        burst:
+            number of requests that can be sent at once without waiting for rate.
+        initial_limit:
+            concurrency limit to start with.
+        min_limit:
+            concurrency limit never goes below this value.
+        max_limit:
+            concurrency limit never goes above this value.
+        latency_threshold:
+            optional number of seconds (until response headers) after which
+            request is treated as a sign of overload.
+        backoff_ratio:
+            concurrency limit is multiplied by it on overload.
+        backoff_interval:
+            minimum number of seconds between two limit decreases.
+    """
+
+    def __init__(
+        self,
+        rate: Optional[float] = None,
+        *,
+        burst: Optional[int] = None,
+        initial_limit: int = 8,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        latency_threshold: Optional[float] = None,
+        backoff_ratio: float = 0.5,
+        backoff_interval: float = 1.0,
+    ) -> None:
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_threshold = latency_threshold
+        self.backoff_ratio = backoff_ratio
+        self.backoff_interval = backoff_interval
+        #: Current concurrency limit
+        self.limit = float(initial_limit)
+        self.in_flight = 0
+        #: Requests that waited in queue (for rate or concurrency limit)
+        self.waits = 0
+        #: Total and maximum number of seconds requests waited in queue
+        self.wait_time = 0.0
+        self.max_wait_time = 0.0
+        self._waiters: Deque[_Waiter] = deque()
+        self._decreased_at = float("-inf")
+        self._lock = Lock()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "limit": int(self.limit),
+                "in_flight": self.in_flight,
+                "queued": len(self._waiters),
+                "waits": self.waits,
+                "wait_time": self.wait_time,
+                "max_wait_time": self.max_wait_time,
+            }
+
+    async def acquire(self) -> None:
+        """Waits until request can be sent."""
+        started = monotonic()
+        delay = self.bucket.reserve() if self.bucket is not None else 0.0
+        if delay:
+            await asyncio.sleep(delay)
+
+        waiter = self._enqueue(asynchronous=True)
+        if waiter is not None and waiter.future is not None:
+            try:
+                await waiter.future
+            except BaseException:
+                self._cancel(waiter)
+                raise
+
+        if delay or waiter is not None:
+            self._waited(monotonic() - started)
+
+    def acquire_sync(self) -> None:
+        """Same as `acquire`, but blocks current thread."""
+        started = monotonic()
+        delay = self.bucket.reserve() if self.bucket is not None else 0.0
+        if delay:
+            sleep(delay)
+
+        waiter = self._enqueue(asynchronous=False)
+        if waiter is not None and waiter.event is not None:
+            waiter.event.wait()
+
+        if delay or waiter is not None:
+            self._waited(monotonic() - started)
+
+    def release(self, latency: float, failed: bool = False) -> None:
+        """Frees request slot and adapts limit to request outcome."""
+        overloaded = failed or (
+            self.latency_threshold is not None and latency > self.latency_threshold
+        )
+        with self._lock:
+            now = monotonic()
+            if not overloaded:
+                self.limit = min(self.limit + 1 / self.limit, self.max_limit)
+            elif now - self._decreased_at >= self.backoff_interval:
+                self.limit = max(self.limit * self.backoff_ratio, self.min_limit)
+                self._decreased_at = now
+
+            self._free_slot()
+
+    async def run(self, factory: Callable[[], Awaitable[T]]) -> T:
+        """Sends request when limits allow it."""
+        await self.acquire()
+        started = monotonic()
+        failed = False
+        try:
+            result = await factory()
+            failed = _is_overload(result)
+            return result
+        except TransportError:
+            failed = True
+            raise
+        finally:
+            self.release(monotonic() - started, failed)
+
+    def run_sync(self, factory: Callable[[], T]) -> T:
+        """Same as `run`, but for synchronous requests."""
+        self.acquire_sync()
+        started = monotonic()
+        failed = False
+        try:
+            result = factory()
+            failed = _is_overload(result)
+            return result
+        except TransportError:
+            failed = True
+            raise
+        finally:
+            self.release(monotonic() - started, failed)
+
+    def stream(
+        self, stream: AsyncContextManager[Response]
+    ) -> AsyncContextManager[Response]:
+        """Wraps streamed request, slot is held until the response is closed."""
+        return _LimitedStream(self, stream)
+
+    def stream_sync(self, stream: ContextManager[Response]) -> ContextManager[Response]:
+        """Same as `stream`, but for synchronous requests."""
+        return _LimitedStreamSync(self, stream)
+
+    def _enqueue(self, asynchronous: bool) -> Optional[_Waiter]:
+        with self._lock:
+            if not self._waiters and self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return None
+
+            waiter = _Waiter(asynchronous)
+            self._waiters.append(waiter)
+            return waiter
+
+    def _cancel(self, waiter: _Waiter) -> None:
+        with self._lock:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            else:
+                # Slot was already given to cancelled waiter, pass it on
+                self._free_slot()
+
+    def _free_slot(self) -> None:
+        self.in_flight -= 1
+        while self._waiters and self.in_flight < int(self.limit):
+            self.in_flight += 1
+            self._waiters.popleft().wake()
+
+    def _waited(self, seconds: float) -> None:
+        with self._lock:
+            self.waits += 1
+            self.wait_time += seconds
+            self.max_wait_time = max(self.max_wait_time, seconds)
+
+
+def _is_overload(result: Any) -> bool:
+    if not isinstance(result, Response):
+        return False
+
+    return result.status_code == 429 or result.status_code >= 500
+
+
+class _LimitedStream:
+    def __init__(
+        self, limiter: AdaptiveLimiter, stream: AsyncContextManager[Response]
+    ) -> None:
+        self._limiter = limiter
+        self._stream = stream
+        self._latency = 0.0
+        self._failed = True
+
+    async def __aenter__(self) -> Response:
+        await self._limiter.acquire()
+        started = monotonic()
+        try:
+            response = await self._stream.__aenter__()
+        except BaseException as exc:
+            failed = isinstance(exc, TransportError)
+            self._limiter.release(monotonic() - started, failed)
+            raise
+
+        self._latency = monotonic() - started
+        self._failed = _is_overload(response)
+        return response
+
+    async def __aexit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> Optional[bool]:
+        try:
+            return await self._stream.__aexit__(exc_type, exc_value, traceback)
+        finally:
+            self._limiter.release(self._latency, self._failed)
+
+
+class _LimitedStreamSync:
+    def __init__(
+        self, limiter: AdaptiveLimiter, stream: ContextManager[Response]
+    ) -> None:
+        self._limiter = limiter
+        self._stream = stream
+        self._latency = 0.0
+        self._failed = True
+
+    def __enter__(self) -> Response:
+        self._limiter.acquire_sync()
+        started = monotonic()
+        try:
+            response = self._stream.__enter__()
+        except BaseException as exc:
+            failed = isinstance(exc, TransportError)
+            self._limiter.release(monotonic() - started, failed)
+            raise
+
+        self._latency = monotonic() - started
+        self._failed = _is_overload(response)
+        return response
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> Optional[bool]:
+        try:
+            return self._stream.__exit__(exc_type, exc_value, traceback)
+        finally:
+            self._limiter.release(self._latency, self._failed)
+
+
+class RequestLimits:
+    """Separate `AdaptiveLimiter` for every SmartPost API request type.
+
+    Request types without own limiter use `default` one (if it is set).
+    """
+
+    def __init__(
+        self,
+        *,
+        destinations: Optional[AdaptiveLimiter] = None,
+        shipment: Optional[AdaptiveLimiter] = None,
+        labels: Optional[AdaptiveLimiter] = None,
+        default: Optional[AdaptiveLimiter] = None,
+    ) -> None:
+        self.limiters: Dict[str, AdaptiveLimiter] = {}
+        for request, limiter in (
+            ("destinations", destinations),
+            ("shipment", shipment),
+            ("labels", labels),
+        ):
+            if limiter is not None:
+                self.limiters[request] = limiter
+
+        self.default = default
+
+    def get(self, request: str) -> Optional[AdaptiveLimiter]:
+        return self.limiters.get(request, self.default)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        stats = {request: limiter.stats() for request, limiter in self.limiters.items()}
+        if self.default is not None:
+            stats["default"] = self.default.stats()
+
+        return stats
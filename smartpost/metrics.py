@@ -0,0 +1,284 @@
+from bisect import bisect_left
+from dataclasses import dataclass
+from threading import Lock
+from time import perf_counter
+from types import TracebackType
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Type,
+)
+
+if TYPE_CHECKING:
+    from httpx import Response
+
+#: Upper bounds of buckets for durations (seconds)
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+#: Upper bounds of buckets for body sizes (bytes)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+
+@dataclass
+class RequestRecord:
+    """Metrics of single client call (including retries and hedged requests)."""
+
+    #: SmartPost API request name - "destinations", "shipment" or "labels"
+    request: str
+    status_code: Optional[int] = None
+    #: Always None for now - HTTPX does not expose connection timings
+    connect_time: Optional[float] = None
+    #: Seconds until response headers were received
+    ttfb: Optional[float] = None
+    #: Seconds the whole call took, including parsing
+    total_time: float = 0.0
+    request_bytes: int = 0
+    response_bytes: int = 0
+    #: Seconds spent parsing XML and creating models
+    parse_time: float = 0.0
+    #: Number of destinations, orders or labels in the call
+    items: int = 0
+    #: Number of HTTP responses received (more than 1 when retried or hedged)
+    responses: int = 0
+    #: Exception class name if call failed
+    error: Optional[str] = None
+
+
+MetricsHook = Callable[[RequestRecord], None]
+
+
+class Measurement:
+    """Collects `RequestRecord` for a client call and passes it to hook when done."""
+
+    __slots__ = ("hook", "record", "_started", "_parse_started")
+
+    def __init__(self, hook: MetricsHook, request: str, request_bytes: int = 0) -> None:
+        self.hook = hook
+        self.record = RequestRecord(request, request_bytes=request_bytes)
+        self._started = 0.0
+        self._parse_started = 0.0
+
+    def __enter__(self) -> "Measurement":
+        self._started = perf_counter()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.record.total_time = perf_counter() - self._started
+        if exc_type is not None:
+            self.record.error = exc_type.__name__
+
+        self.hook(self.record)
+
+    def responded(self, response: "Response") -> None:
+        """Notes response with headers received, but body not read yet."""
+        record = self.record
+        record.status_code = response.status_code
+        record.responses += 1
+        if record.ttfb is None:
+            record.ttfb = perf_counter() - self._started
+
+    def sent(self, size: int) -> None:
+        """Notes part of streamed request body (size is not known upfront)."""
+        self.record.request_bytes += size
+
+    def received(self, size: int) -> None:
+        self.record.response_bytes += size
+
+    def start_parsing(self) -> None:
+        self._parse_started = perf_counter()
+
+    def stop_parsing(self) -> None:
+        self.record.parse_time += perf_counter() - self._parse_started
+
+    def count(self, items: int) -> None:
+        self.record.items += items
+
+
+class _NullMeasurement(Measurement):
+    """Measurement that does nothing, used when client has no metrics hook."""
+
+    __slots__ = ()
+
+    def __init__(self) -> None:
+        pass
+
+    def __enter__(self) -> "Measurement":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        pass
+
+    def responded(self, response: "Response") -> None:
+        pass
+
+    def sent(self, size: int) -> None:
+        pass
+
+    def received(self, size: int) -> None:
+        pass
+
+    def start_parsing(self) -> None:
+        pass
+
+    def stop_parsing(self) -> None:
+        pass
+
+    def count(self, items: int) -> None:
+        pass
+
+
+NULL_MEASUREMENT: Measurement = _NullMeasurement()
+
+
+def measure(
+    hook: Optional[MetricsHook], request: str, request_bytes: int = 0
+) -> Measurement:
+    """Returns measurement for client call, no-op one if `hook` is not set."""
+    if hook is None:
+        return NULL_MEASUREMENT
+
+    return Measurement(hook, request, request_bytes)
+
+
+class Histogram:
+    """Cumulative histogram with fixed buckets, same as Prometheus one."""
+
+    __slots__ = ("buckets", "counts", "count", "sum")
+
+    def __init__(self, buckets: Sequence[float]) -> None:
+        self.buckets = tuple(buckets)
+        # Last count is for values above all buckets (+Inf)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        """Returns (upper bound, number of values <= bound) pairs."""
+        pairs = []
+        total = 0
+        for bound, count in zip((*map(str, self.buckets), "+Inf"), self.counts):
+            total += count
+            pairs.append((bound, total))
+
+        return pairs
+
+
+_HISTOGRAMS: Dict[str, Sequence[float]] = {
+    "ttfb": TIME_BUCKETS,
+    "total_time": TIME_BUCKETS,
+    "parse_time": TIME_BUCKETS,
+    "request_bytes": SIZE_BUCKETS,
+    "response_bytes": SIZE_BUCKETS,
+}
+
+
+class MetricsAggregator:
+    """In-process metrics hook that keeps histograms per request name.
+
+    Pass instance as `metrics` to `smartpost.Client` or `smartpost.sync.Client`,
+    then scrape it with `snapshot` or `prometheus`. Safe to share between threads.
+    """
+
+    def __init__(self, keep_last: int = 0) -> None:
+        #: Number of last records kept in `records` (for debugging)
+        self.keep_last = keep_last
+        self.records: List[RequestRecord] = []
+        self._histograms: Dict[Tuple[str, str], Histogram] = {}
+        self._counters: Dict[Tuple[str, str, str], int] = {}
+        self._lock = Lock()
+
+    def __call__(self, record: RequestRecord) -> None:
+        status = str(record.status_code) if record.status_code else "none"
+        with self._lock:
+            for name, buckets in _HISTOGRAMS.items():
+                value = getattr(record, name)
+                if value is None:
+                    continue
+
+                key = (record.request, name)
+                histogram = self._histograms.get(key)
+                if histogram is None:
+                    histogram = self._histograms[key] = Histogram(buckets)
+
+                histogram.observe(value)
+
+            self._count((record.request, "calls", status), 1)
+            self._count((record.request, "items", ""), record.items)
+            self._count((record.request, "responses", ""), record.responses)
+            if record.error:
+                self._count((record.request, "errors", record.error), 1)
+
+            if self.keep_last:
+                self.records.append(record)
+                if len(self.records) > self.keep_last:
+                    del self.records[0]
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Returns all metrics as nested dicts, keyed by request name."""
+        result: Dict[str, Any] = {}
+        with self._lock:
+            for (request, name), histogram in self._histograms.items():
+                result.setdefault(request, {})[name] = {
+                    "count": histogram.count,
+                    "sum": histogram.sum,
+                    "buckets": dict(histogram.cumulative()),
+                }
+
+            for (request, name, label), value in self._counters.items():
+                counters = result.setdefault(request, {}).setdefault(name, {})
+                counters[label or "total"] = value
+
+        return result
+
+    def prometheus(self, prefix: str = "smartpost") -> str:
+        """Returns all metrics in Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for (request, name), histogram in sorted(self._histograms.items()):
+                metric = f"{prefix}_{name}"
+                labels = f'request="{request}"'
+                for bound, count in histogram.cumulative():
+                    lines.append(f'{metric}_bucket{{{labels},le="{bound}"}} {count}')
+
+                lines.append(f"{metric}_sum{{{labels}}} {histogram.sum}")
+                lines.append(f"{metric}_count{{{labels}}} {histogram.count}")
+
+            for (request, name, label), value in sorted(self._counters.items()):
+                labels = f'request="{request}"'
+                if name == "calls":
+                    labels += f',status="{label}"'
+                elif name == "errors":
+                    labels += f',error="{label}"'
+
+                lines.append(f"{prefix}_{name}_total{{{labels}}} {value}")
+
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+            self.records.clear()
+
+    def _count(self, key: Tuple[str, str, str], value: int) -> None:
+        self._counters[key] = self._counters.get(key, 0) + value
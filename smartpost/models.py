@@ -1,10 +1,67 @@
-from dataclasses import dataclass, field
-from typing import Literal, Optional, TypedDict, Union
+from dataclasses import dataclass, field, fields
+from typing import (
+    TYPE_CHECKING,
+    Literal,
+    Optional,
+    Type,
+    TypedDict,
+    TypeVar,
+    Union,
+    cast,
+)
 
-# We don't use it with untrusted random input
-from xml.etree.ElementTree import Element, SubElement  # nosec: B405
+if TYPE_CHECKING:
+    # ElementTree is imported by `to_xml` methods, models are used without it
+    from xml.etree.ElementTree import Element  # nosec: B405
 
+T = TypeVar("T")
 
+
+def xml_escape(text: str) -> str:
+    """Escapes text node the same way as `xml.etree.ElementTree` does."""
+    if "&" in text:
+        text = text.replace("&", "&amp;")
+
+    if "<" in text:
+        text = text.replace("<", "&lt;")
+
+    if ">" in text:
+        text = text.replace(">", "&gt;")
+
+    return text
+
+
+def xml_element(tag: str, text: Optional[str]) -> str:
+    """Renders element with text exactly like `ElementTree.tostring`."""
+    if not text:
+        return f"<{tag} />"
+
+    return f"<{tag}>{xml_escape(text)}</{tag}>"
+
+
+def encode_xml(document: str) -> bytes:
+    """Encodes XML string like `ElementTree.tostring` (US-ASCII + char refs)."""
+    return document.encode("ascii", "xmlcharrefreplace")
+
+
+def _slotted(cls: Type[T]) -> Type[T]:
+    """Recreates dataclass with `__slots__` (`slots=True` needs Python 3.10)."""
+    cls_dict = dict(cls.__dict__)
+    names = tuple(f.name for f in fields(cls))  # type: ignore[arg-type]
+    cls_dict["__slots__"] = names
+    for name in names:
+        # Defaults are kept by generated __init__, class attributes would clash
+        cls_dict.pop(name, None)
+
+    cls_dict.pop("__dict__", None)
+    cls_dict.pop("__weakref__", None)
+    slotted_cls = cast(Type[T], type(cls.__name__, cls.__bases__, cls_dict))
+    slotted_cls.__qualname__ = cls.__qualname__
+    return slotted_cls
+
+
+# Lots of destinations are kept in memory, so they have no per-instance __dict__
+@_slotted
 @dataclass
 class Destination:
     place_id: int
@@ -47,7 +104,10 @@ class Recipient:
     #: ID code of the recipient; needed if ID validation is required.
     idcode: Optional[int] = None
 
-    def to_xml(self) -> Element:
+    def to_xml(self) -> "Element":
+        # We don't use it with untrusted random input
+        from xml.etree.ElementTree import Element, SubElement  # nosec: B405
+
         recipient = Element("recipient")
         name = SubElement(recipient, "name")
         name.text = self.name
@@ -68,17 +128,42 @@ class Recipient:
 
         return recipient
 
+    def to_xml_string(self) -> str:
+        """Same as `to_xml`, but renders XML string right away (much faster)."""
+        parts = [
+            "<recipient>",
+            xml_element("name", self.name),
+            xml_element("phone", self.phone),
+            xml_element("email", self.email),
+        ]
+        if self.cash is not None:
+            parts.append(xml_element("cash", str(self.cash)))
+
+        if self.idcode is not None:
+            parts.append(xml_element("idcode", str(self.idcode)))
+
+        parts.append("</recipient>")
+        return "".join(parts)
+
 
 @dataclass
 class EETerminalDestination:
     place_id: int
 
-    def to_xml(self) -> Element:
+    def to_xml(self) -> "Element":
+        # We don't use it with untrusted random input
+        from xml.etree.ElementTree import Element, SubElement  # nosec: B405
+
         destination = Element("destination")
         place_id = SubElement(destination, "place_id")
         place_id.text = str(self.place_id)
         return destination
 
+    def to_xml_string(self) -> str:
+        """Same as `to_xml`, but renders XML string right away (much faster)."""
+        place_id = xml_element("place_id", str(self.place_id))
+        return f"<destination>{place_id}</destination>"
+
 
 @dataclass
 class EECourierDestination:
@@ -91,7 +176,7 @@ class EECourierDestination:
     details: str
     timewindow: Literal[1, 2, 3]
 
-    def to_xml(self) -> Element:
+    def to_xml(self) -> "Element":
         # TODO: IMPLEMENT
         raise NotImplementedError()
 
@@ -101,7 +186,10 @@ class FIDestination:
     postalcode: str
     routingcode: str
 
-    def to_xml(self) -> Element:
+    def to_xml(self) -> "Element":
+        # We don't use it with untrusted random input
+        from xml.etree.ElementTree import Element, SubElement  # nosec: B405
+
         destination = Element("destination")
         postalcode = SubElement(destination, "postalcode")
         postalcode.text = self.postalcode
@@ -109,6 +197,12 @@ class FIDestination:
         routingcode.text = self.routingcode
         return destination
 
+    def to_xml_string(self) -> str:
+        """Same as `to_xml`, but renders XML string right away (much faster)."""
+        postalcode = xml_element("postalcode", self.postalcode)
+        routingcode = xml_element("routingcode", self.routingcode)
+        return f"<destination>{postalcode}{routingcode}</destination>"
+
 
 ShipmentDestination = Union[EETerminalDestination, EECourierDestination, FIDestination]
 
@@ -130,7 +224,10 @@ class ShipmentOrder:
     lqitems: None = None
     additionalservices: None = None
 
-    def to_xml(self) -> Element:
+    def to_xml(self) -> "Element":
+        # We don't use it with untrusted random input
+        from xml.etree.ElementTree import Element, SubElement  # nosec: B405
+
         item = Element("item")
         recipient_el = self.recipient.to_xml()
         item.append(recipient_el)
@@ -167,11 +264,54 @@ class ShipmentOrder:
 
         return item
 
+    def to_xml_string(self) -> str:
+        """Same as `to_xml`, but renders XML string right away (much faster).
+
+        Raises:
+            TypeError:
+                destination is `EECourierDestination`, courier orders are not
+                supported yet.
+        """
+        if isinstance(self.destination, EECourierDestination):
+            raise TypeError(
+                "Courier destination (EECourierDestination) is not supported"
+            )
+
+        parts = [
+            "<item>",
+            self.recipient.to_xml_string(),
+            self.destination.to_xml_string(),
+        ]
+
+        # Optional fields handling
+
+        if self.barcode:
+            parts.append(xml_element("barcode", self.barcode))
+
+        if self.reference:
+            parts.append(xml_element("reference", self.reference))
+
+        if self.content:
+            parts.append(xml_element("content", self.content))
+
+        if self.orderparent:
+            parts.append(xml_element("orderparent", self.orderparent))
+
+        if self.weight:
+            parts.append(xml_element("weight", str(self.weight)))
+
+        if self.size:
+            parts.append(xml_element("size", str(self.size)))
+
+        parts.append("</item>")
+        return "".join(parts)
+
 
 class SenderDoorCode(TypedDict):
     doorcode: int
 
 
+@_slotted
 @dataclass
 class OrderInfo:
     barcode: str
@@ -182,6 +322,8 @@ class OrderInfo:
     doorcode: Optional[int] = field(default=None, init=False)
 
     def __post_init__(self) -> None:
+        # Slotted instance has no class attribute to fall back to, always set it
+        self.doorcode = None
         if self.sender:
             # Values passed to __init__ are expected to be str (XML)
             self.doorcode = int(self.sender["doorcode"])
@@ -0,0 +1,67 @@
+from typing import Any, Dict, Iterator, List, Optional
+
+# We don't use it with untrusted random input
+from xml.etree.ElementTree import Element, XMLPullParser  # nosec: B405
+
+from smartpost.models import Destination
+
+
+def parse_xml(document: bytes, **kwargs: Any) -> Any:
+    """Same as `xmltodict.parse`, but xmltodict is imported on first use.
+
+    It is slow to import and only needed for shipment responses.
+    """
+    from xmltodict import parse  # type: ignore[import]
+
+    return parse(document, **kwargs)
+
+
+def _text(element: Element) -> Optional[str]:
+    # Same as xmltodict: whitespace is stripped, empty elements become None
+    return (element.text or "").strip() or None
+
+
+class DestinationParser:
+    """Incremental parser of destinations XML document.
+
+    Feed it with response body chunks, it returns `Destination` instances as soon
+    as their `<item>` elements are closed. Parsed elements are dropped right away,
+    so memory usage does not grow with document size.
+    """
+
+    def __init__(self) -> None:
+        # Events are (str, Element) pairs, typeshed is too generic about them
+        self._parser: Any = XMLPullParser(events=("start", "end"))
+        self._root: Optional[Element] = None
+
+    def feed(self, data: bytes) -> List[Destination]:
+        self._parser.feed(data)
+        return list(self._read_destinations())
+
+    def close(self) -> List[Destination]:
+        self._parser.close()
+        return list(self._read_destinations())
+
+    def _read_destinations(self) -> Iterator[Destination]:
+        for event, element in self._parser.read_events():
+            if event == "start":
+                if self._root is None:
+                    self._root = element
+
+                continue
+
+            if element.tag != "item":
+                continue
+
+            item: Dict[str, Any] = {child.tag: _text(child) for child in element}
+            yield Destination(**item)
+            # Items are closed in document order, so it's the first child left
+            root = self._root
+            if root is not None and len(root) and root[0] is element:
+                del root[0]
+
+
+def parse_destinations(data: bytes) -> List[Destination]:
+    """Parses whole destinations XML document."""
+    parser = DestinationParser()
+    return parser.feed(data) + parser.close()
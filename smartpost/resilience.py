@@ -0,0 +1,273 @@
+import asyncio
+import time
+from random import random
+from threading import Lock
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, Optional, TypeVar
+
+from httpx import HTTPStatusError, Response, TransportError
+
+from smartpost.errors import CircuitOpenError, ShipmentLabelsError
+
+T = TypeVar("T")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Fails fast after `failure_threshold` consecutive failed requests.
+
+    Open breaker rejects requests with `CircuitOpenError` for `reset_timeout`
+    seconds, then it becomes half-open and lets single probe request through.
+    Successful probe closes the breaker, failed one opens it again.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        #: Consecutive failures since last success
+        self.failures = 0
+        #: Requests rejected without being sent
+        self.rejected = 0
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = Lock()
+
+    @property
+    def state(self) -> str:
+        """One of "closed", "open" or "half_open"."""
+        with self._lock:
+            return self._current_state()
+
+    def before_request(self) -> bool:
+        """Raises `CircuitOpenError` if request should not be sent.
+
+        Returns:
+            True if request is half-open probe, its outcome must be recorded
+            or the probe must be abandoned with `abandon_probe`.
+        """
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return False
+
+            if state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+
+            self.rejected += 1
+            retry_after = self._opened_at + self.reset_timeout - time.monotonic()
+            raise CircuitOpenError(max(retry_after, 0.0))
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self._state = CLOSED
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self._probing or self.failures >= self.failure_threshold:
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+    def abandon_probe(self) -> None:
+        """Frees probe slot of request that ended without outcome (cancelled)."""
+        with self._lock:
+            self._probing = False
+
+    def _current_state(self) -> str:
+        opened_for = time.monotonic() - self._opened_at
+        if self._state == OPEN and opened_for >= self.reset_timeout:
+            return HALF_OPEN
+
+        return self._state
+
+
+class RetryBudget:
+    """Limits retries to `ratio` of requests, so retries can't multiply load.
+
+    Every request adds `ratio` of a token (up to `max_tokens`), every retry takes
+    a whole token. Budget starts with `min_tokens` so rare requests are retried.
+    """
+
+    def __init__(
+        self, ratio: float = 0.2, min_tokens: float = 10, max_tokens: float = 100
+    ) -> None:
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self._tokens = float(min_tokens)
+        self._lock = Lock()
+
+    @property
+    def tokens(self) -> float:
+        return self._tokens
+
+    def deposit(self) -> None:
+        with self._lock:
+            self._tokens = min(self._tokens + self.ratio, self.max_tokens)
+
+    def withdraw(self) -> bool:
+        """Returns True if retry is allowed."""
+        with self._lock:
+            if self._tokens < 1:
+                return False
+
+            self._tokens -= 1
+            return True
+
+
+class ResiliencePolicy:
+    """Retries failed requests with exponential backoff and circuit breaker.
+
+    Network errors, timeouts and responses with `retry_statuses` are failures.
+    They are retried up to `max_attempts` attempts in total, waiting random time
+    up to `backoff_base * 2 ** retry` seconds (but no more than `backoff_max`)
+    between attempts, as long as retry budget allows. Single policy instance can
+    be shared by many clients (including sync ones) to protect them all.
+
+    Args:
+        max_attempts:
+            maximum number of attempts per request, including the first one.
+        backoff_base:
+            backoff of the first retry in seconds, it doubles with every retry.
+        backoff_max:
+            maximum backoff in seconds.
+        retry_statuses:
+            HTTP status codes that are treated as transient failures.
+        budget:
+            `RetryBudget` shared by all requests, default allows 20% of retries.
+        breaker:
+            `CircuitBreaker` shared by all requests.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_attempts: int = 3,
+        backoff_base: float = 0.1,
+        backoff_max: float = 2.0,
+        retry_statuses: FrozenSet[int] = frozenset((500, 502, 503, 504)),
+        budget: Optional[RetryBudget] = None,
+        breaker: Optional[CircuitBreaker] = None,
+    ) -> None:
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_statuses = retry_statuses
+        self.budget = budget or RetryBudget()
+        self.breaker = breaker or CircuitBreaker()
+        #: Retries made
+        self.retries = 0
+        #: Failed requests that were not retried because budget was exhausted
+        self.budget_exhausted = 0
+
+    def backoff(self, retry: int) -> float:
+        """Returns seconds to wait before `retry` (starting from 0), full jitter."""
+        ceiling = min(self.backoff_max, self.backoff_base * 2**retry)
+        # Jitter does not need cryptographically secure randomness
+        return random() * ceiling  # nosec: B311
+
+    def is_failure(self, result: Any = None, exc: Any = None) -> bool:
+        """Tells whether request result or exception is a transient failure."""
+        if exc is not None:
+            if isinstance(exc, TransportError):
+                return True
+
+            if isinstance(exc, HTTPStatusError):
+                return exc.response.status_code in self.retry_statuses
+
+            if isinstance(exc, ShipmentLabelsError):
+                return exc.status_code in self.retry_statuses
+
+            return False
+
+        return isinstance(result, Response) and (
+            result.status_code in self.retry_statuses
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.breaker.state,
+            "failures": self.breaker.failures,
+            "rejected": self.breaker.rejected,
+            "retries": self.retries,
+            "budget_exhausted": self.budget_exhausted,
+            "budget_tokens": self.budget.tokens,
+        }
+
+    async def run(self, factory: Callable[[], Awaitable[T]], retry: bool = True) -> T:
+        """Runs request with retries (if `retry` is True) through circuit breaker.
+
+        Response with retry status is returned as is after the last attempt.
+
+        Raises:
+            CircuitOpenError:
+                circuit breaker is open, request was not sent.
+        """
+        self.budget.deposit()
+        attempt = 0
+        while True:
+            probe = self.breaker.before_request()
+            try:
+                result = await factory()
+            except Exception as exc:  # noqa: PIE786 - re-raised unless retried
+                if not self._failed(exc=exc) or not self._should_retry(attempt, retry):
+                    raise
+            except BaseException:  # noqa: PIE786 - cancelled, outcome is unknown
+                if probe:
+                    self.breaker.abandon_probe()
+
+                raise
+            else:
+                if not self._failed(result) or not self._should_retry(attempt, retry):
+                    return result
+
+            await asyncio.sleep(self.backoff(attempt))
+            attempt += 1
+
+    def run_sync(self, factory: Callable[[], T], retry: bool = True) -> T:
+        """Same as `run`, but for synchronous requests."""
+        self.budget.deposit()
+        attempt = 0
+        while True:
+            probe = self.breaker.before_request()
+            try:
+                result = factory()
+            except Exception as exc:  # noqa: PIE786 - re-raised unless retried
+                if not self._failed(exc=exc) or not self._should_retry(attempt, retry):
+                    raise
+            except BaseException:  # noqa: PIE786 - cancelled, outcome is unknown
+                if probe:
+                    self.breaker.abandon_probe()
+
+                raise
+            else:
+                if not self._failed(result) or not self._should_retry(attempt, retry):
+                    return result
+
+            time.sleep(self.backoff(attempt))
+            attempt += 1
+
+    def _failed(self, result: Any = None, exc: Any = None) -> bool:
+        if self.is_failure(result, exc):
+            self.breaker.record_failure()
+            return True
+
+        self.breaker.record_success()
+        return False
+
+    def _should_retry(self, attempt: int, retry: bool) -> bool:
+        if not retry or attempt + 1 >= self.max_attempts:
+            return False
+
+        if not self.budget.withdraw():
+            self.budget_exhausted += 1
+            return False
+
+        self.retries += 1
+        return True
@@ -0,0 +1,258 @@
+import re
+from bisect import bisect_left, insort
+from heapq import nsmallest
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from unicodedata import combining, normalize
+
+from smartpost.diff import DestinationDiff
+from smartpost.models import Destination
+
+#: Searchable fields and weights of matches in them
+FIELD_WEIGHTS = (("name", 1.0), ("city", 0.8), ("postalcode", 0.8), ("address", 0.6))
+# Match quality: query term is the whole token, its prefix or prefix with typos
+_EXACT = 3.0
+_PREFIX = 2.0
+_FUZZY = 1.0
+_SEPARATORS = re.compile(r"[^\w]+|_")
+
+
+def fold(text: str) -> str:
+    """Lowercases text and strips diacritics ("Pärnu mnt" -> "parnu mnt")."""
+    decomposed = normalize("NFKD", text.casefold())
+    return "".join(char for char in decomposed if not combining(char))
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Splits folded text into words and numbers."""
+    return [token for token in _SEPARATORS.split(fold(text or "")) if token]
+
+
+def max_typos(term: str) -> int:
+    """Number of typos tolerated in query term of given length."""
+    if len(term) < 4:
+        return 0
+
+    return 1 if len(term) < 8 else 2
+
+
+def _trigrams(token: str) -> Set[str]:
+    # Start is marked, so that grams of token beginning are preferred
+    padded = f"^{token}"
+    grams = set()
+    for start in range(max(len(padded) - 2, 1)):
+        end = start + 3
+        grams.add(padded[start:end])
+
+    return grams
+
+
+def prefix_distance(term: str, token: str, limit: int) -> int:
+    """Returns edit distance between `term` and the closest prefix of `token`.
+
+    Returns `limit + 1` once distance is known to be over `limit`.
+    """
+    # Row j is distance between term[:i] and token[:j], minimum of the last
+    # row is distance to the closest prefix of token
+    previous = list(range(len(token) + 1))
+    for i, char in enumerate(term, 1):
+        current = [i]
+        for j, other in enumerate(token, 1):
+            cost = 0 if char == other else 1
+            current.append(
+                min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            )
+
+        if min(current) > limit:
+            return limit + 1
+
+        previous = current
+
+    return min(previous)
+
+
+class DestinationSearch:
+    """Autocomplete index over destination names, cities, postal codes, addresses.
+
+    Text is folded (lowercased, diacritics stripped) and split into tokens, so
+    "parnu" finds "Pärnu". Tokens are kept in sorted list for prefix lookups
+    and in trigram index for typo-tolerant lookups, both are updated
+    incrementally when destinations are added, removed or changed.
+
+    Args:
+        destinations:
+            destinations to index, usually result of `Client.get_*_terminals`.
+    """
+
+    def __init__(self, destinations: Iterable[Destination] = ()) -> None:
+        self._entries: Dict[int, Tuple[Destination, Dict[str, float]]] = {}
+        #: token -> {place_id: best field weight of token in destination}
+        self._postings: Dict[str, Dict[int, float]] = {}
+        self._tokens: List[str] = []
+        self._trigrams: Dict[str, Set[str]] = {}
+        for destination in destinations:
+            self.add(destination)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, place_id: object) -> bool:
+        return place_id in self._entries
+
+    def __iter__(self) -> Iterator[Destination]:
+        return (destination for destination, _ in self._entries.values())
+
+    def get(self, place_id: int) -> Optional[Destination]:
+        entry = self._entries.get(place_id)
+        return entry[0] if entry else None
+
+    def add(self, destination: Destination) -> None:
+        """Adds destination, replacing one with the same `place_id`."""
+        self.remove(destination.place_id)
+        weights: Dict[str, float] = {}
+        for name, weight in FIELD_WEIGHTS:
+            for token in tokenize(getattr(destination, name)):
+                weights[token] = max(weights.get(token, 0.0), weight)
+
+        self._entries[destination.place_id] = (destination, weights)
+        for token, weight in weights.items():
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = {}
+                insort(self._tokens, token)
+                for gram in _trigrams(token):
+                    self._trigrams.setdefault(gram, set()).add(token)
+
+            postings[destination.place_id] = weight
+
+    def remove(self, place_id: int) -> None:
+        entry = self._entries.pop(place_id, None)
+        if entry is None:
+            return
+
+        for token in entry[1]:
+            postings = self._postings[token]
+            del postings[place_id]
+            if postings:
+                continue
+
+            del self._postings[token]
+            del self._tokens[bisect_left(self._tokens, token)]
+            for gram in _trigrams(token):
+                tokens = self._trigrams[gram]
+                tokens.discard(token)
+                if not tokens:
+                    del self._trigrams[gram]
+
+    def update(self, destinations: Iterable[Destination]) -> None:
+        """Brings index in sync with refreshed destination list.
+
+        Only destinations that were added, removed or changed are touched,
+        unchanged ones stay in place.
+        """
+        seen = set()
+        for destination in destinations:
+            seen.add(destination.place_id)
+            entry = self._entries.get(destination.place_id)
+            if entry is None or entry[0] != destination:
+                self.add(destination)
+
+        for place_id in [
+            place_id for place_id in self._entries if place_id not in seen
+        ]:
+            self.remove(place_id)
+
+    def apply(self, diff: DestinationDiff) -> None:
+        """Applies changes reported by `DestinationTracker` or `diff_destinations`."""
+        for destination in diff.removed:
+            self.remove(destination.place_id)
+
+        for destination in diff.added:
+            self.add(destination)
+
+        for change in diff.changed:
+            self.add(change.new)
+
+    def search(
+        self, query: str, limit: int = 10, *, fuzzy: bool = True
+    ) -> List[Tuple[Destination, float]]:
+        """Finds destinations matching every word of query as prefix.
+
+        With `fuzzy`, words of 4+ characters also match with a typo (two typos
+        for 8+ characters). Destinations are ranked by match quality (whole
+        word, prefix, with typos) weighted by field (name first).
+
+        Returns:
+            Up to `limit` (destination, score) pairs, best match first.
+        """
+        terms = tokenize(query)
+        if not terms or limit <= 0:
+            return []
+
+        matches = [self._matching_tokens(term, fuzzy) for term in set(terms)]
+        # Candidates come from the most selective term, other terms are checked
+        # against tokens of candidates instead of merging their postings
+        matches.sort(key=self._postings_count)
+        scores: Dict[int, float] = {}
+        for token, quality in matches[0].items():
+            for place_id, weight in self._postings[token].items():
+                score = quality * weight
+                if score > scores.get(place_id, 0.0):
+                    scores[place_id] = score
+
+        for tokens in matches[1:]:
+            refined = {}
+            for place_id, score in scores.items():
+                weights = self._entries[place_id][1]
+                best = max(
+                    (
+                        tokens[token] * weight
+                        for token, weight in weights.items()
+                        if token in tokens
+                    ),
+                    default=0.0,
+                )
+                if best:
+                    refined[place_id] = score + best
+
+            scores = refined
+
+        best_scores = nsmallest(
+            limit,
+            scores.items(),
+            key=lambda item: (-item[1], self._entries[item[0]][0].name, item[0]),
+        )
+        return [(self._entries[place_id][0], score) for place_id, score in best_scores]
+
+    def _postings_count(self, tokens: Dict[str, float]) -> int:
+        return sum(len(self._postings[token]) for token in tokens)
+
+    def _matching_tokens(self, term: str, fuzzy: bool) -> Dict[str, float]:
+        """Returns {token: match quality} of indexed tokens matching term."""
+        tokens = {}
+        index = bisect_left(self._tokens, term)
+        while index < len(self._tokens) and self._tokens[index].startswith(term):
+            token = self._tokens[index]
+            tokens[token] = _EXACT if token == term else _PREFIX
+            index += 1
+
+        typos = max_typos(term) if fuzzy else 0
+        if not typos:
+            return tokens
+
+        # Tokens sharing enough trigrams with term are checked with edit distance
+        grams = _trigrams(term)
+        shared: Dict[str, int] = {}
+        for gram in grams:
+            for token in self._trigrams.get(gram, ()):
+                shared[token] = shared.get(token, 0) + 1
+
+        required = max(1, len(grams) - 3 * typos)
+        for token, count in shared.items():
+            if count < required or token in tokens:
+                continue
+
+            distance = prefix_distance(term, token, typos)
+            if distance <= typos:
+                tokens[token] = _FUZZY - 0.25 * (distance - 1)
+
+        return tokens
@@ -0,0 +1,42 @@
+from asyncio import Future, ensure_future, shield
+from typing import Any, Awaitable, Callable, Dict, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Coalesces concurrent identical calls into a single in-flight call.
+
+    First caller for a key starts the call, everyone who asks for the same key
+    while it is running awaits the same result (or exception). Cancelling one of
+    the waiters does not cancel the shared call for others. Result object is
+    shared by all waiters too, mutable results must be copied by caller.
+    """
+
+    def __init__(self) -> None:
+        self._calls: Dict[Hashable, "Future[Any]"] = {}
+
+    def __len__(self) -> int:
+        """Number of calls currently in flight."""
+        return len(self._calls)
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable[T]]) -> T:
+        future = self._calls.get(key)
+        if future is None:
+            future = ensure_future(factory())
+            self._calls[key] = future
+            future.add_done_callback(lambda _: self._forget(key, future))
+            future.add_done_callback(_retrieve_exception)
+
+        return await shield(future)
+
+    def _forget(self, key: Hashable, future: "Future[Any]") -> None:
+        if self._calls.get(key) is future:
+            del self._calls[key]
+
+
+def _retrieve_exception(future: "Future[Any]") -> None:
+    # Every waiter may be cancelled before the shared call fails, asyncio would
+    # log "exception was never retrieved" then
+    if not future.cancelled():
+        future.exception()
@@ -0,0 +1,296 @@
+import json
+import os
+from array import array
+from dataclasses import dataclass, field
+from mmap import ACCESS_READ, mmap
+from struct import Struct
+from threading import get_ident
+from time import time
+from types import TracebackType
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Literal,
+    Optional,
+    Sequence,
+    Tuple,
+    Type,
+    Union,
+)
+
+from smartpost.errors import SnapshotError
+from smartpost.models import Destination
+
+MAGIC = b"SPDSNAP\x00"
+VERSION = 1
+#: magic, version, reserved, created at (unix time), index offset
+_HEADER = Struct("<8sIIdQ")
+_STRING_FIELDS = (
+    "name",
+    "city",
+    "address",
+    "country",
+    "postalcode",
+    "routingcode",
+    "availability",
+    "description",
+)
+# XML text can't contain NUL character, so it marks None values
+_NONE = "\x00"
+
+
+@dataclass
+class SnapshotList:
+    """Single destination list in snapshot."""
+
+    #: (country, type, filter) - filter is empty string when not used
+    key: Tuple[str, str, str]
+    destinations: Union[Sequence[Destination], "SnapshotDestinations"]
+    #: Validators from response headers, used for conditional requests
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    #: Unix time the list was fetched from SmartPost API
+    fetched_at: float = field(default_factory=time)
+
+
+class SnapshotDestinations:
+    """Read-only view of destination list stored in memory-mapped snapshot.
+
+    Nothing is copied when snapshot is loaded, destinations are decoded from
+    shared pages when rows are accessed.
+    """
+
+    def __init__(self, buffer: memoryview, rows: int, columns: Dict[str, Any]) -> None:
+        self._rows = rows
+        self.place_id = _column(buffer, columns["place_id"], "q", rows)
+        self.lat = _column(buffer, columns["lat"], "d", rows)
+        self.lng = _column(buffer, columns["lng"], "d", rows)
+        self._strings = {}
+        for name in _STRING_FIELDS:
+            offsets, start, end = columns[name]
+            self._strings[name] = (
+                _column(buffer, offsets, "I", rows + 1),
+                buffer[start:end],
+            )
+
+    def __len__(self) -> int:
+        return self._rows
+
+    def __getitem__(self, row: int) -> Destination:
+        if row < 0:
+            row += self._rows
+
+        if not 0 <= row < self._rows:
+            raise IndexError("SnapshotDestinations index out of range")
+
+        return self._materialize(row)
+
+    def __iter__(self) -> Iterator[Destination]:
+        return (self._materialize(row) for row in range(self._rows))
+
+    def to_list(self) -> List[Destination]:
+        return list(self)
+
+    def _string(self, name: str, row: int) -> Optional[str]:
+        offsets, data = self._strings[name]
+        start, end = offsets[row], offsets[row + 1]
+        value = str(data[start:end], "utf-8")
+        return None if value == _NONE else value
+
+    def _materialize(self, row: int) -> Destination:
+        values: Dict[str, Any] = {
+            name: self._string(name, row) for name in _STRING_FIELDS
+        }
+        return Destination(
+            place_id=self.place_id[row],
+            lat=self.lat[row],
+            lng=self.lng[row],
+            **values,
+        )
+
+    def release(self) -> None:
+        """Releases views of snapshot memory, so that it can be unmapped."""
+        self._rows = 0
+        views = [self.place_id, self.lat, self.lng]
+        for offsets, data in self._strings.values():
+            views.extend((offsets, data))
+
+        for view in views:
+            view.release()
+
+
+def _column(
+    buffer: memoryview, offset: int, typecode: Literal["q", "d", "I"], length: int
+) -> Any:
+    end = offset + Struct(typecode).size * length
+    return buffer[offset:end].cast(typecode)
+
+
+class DestinationSnapshot:
+    """Memory-mapped snapshot of destination lists written by `write_snapshot`.
+
+    Many processes can open the same snapshot, operating system shares its pages
+    between them. Snapshot is replaced atomically, so opened snapshot stays
+    valid (and unchanged) even when a newer one is written.
+
+    Raises:
+        SnapshotError:
+            file can't be read (e.g. it is empty), is not a snapshot or was
+            written by incompatible version.
+    """
+
+    def __init__(self, path: Union[str, "os.PathLike[str]"]) -> None:
+        try:
+            with open(path, "rb") as file:
+                self._mmap = mmap(file.fileno(), 0, access=ACCESS_READ)
+        except (OSError, ValueError) as exc:
+            # ValueError is raised for empty file, it can't be mapped
+            raise SnapshotError(f"Snapshot can't be mapped: {exc}") from exc
+
+        self._buffer = memoryview(self._mmap)
+        self.lists: Dict[Tuple[str, str, str], SnapshotList] = {}
+        try:
+            self._read_index()
+        except SnapshotError:
+            self.close()
+            raise
+
+    def _read_index(self) -> None:
+        if len(self._buffer) < _HEADER.size:
+            raise SnapshotError("File is too small to be destinations snapshot")
+
+        magic, version, _, created_at, index_offset = _HEADER.unpack_from(self._buffer)
+        if magic != MAGIC or version != VERSION:
+            raise SnapshotError(f"Unsupported snapshot (version {version})")
+
+        #: Unix time the snapshot was written
+        self.created_at: float = created_at
+        try:
+            index = json.loads(bytes(self._buffer[index_offset:]))
+            for item in index["lists"]:
+                key = (item["country"], item["type"], item["filter"])
+                self.lists[key] = SnapshotList(
+                    key=key,
+                    destinations=SnapshotDestinations(
+                        self._buffer, item["rows"], item["columns"]
+                    ),
+                    etag=item["etag"],
+                    last_modified=item["last_modified"],
+                    fetched_at=item["fetched_at"],
+                )
+        except (ValueError, KeyError, TypeError) as exc:
+            raise SnapshotError("Snapshot index is corrupted") from exc
+
+    def __enter__(self) -> "DestinationSnapshot":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+    @property
+    def age(self) -> float:
+        """Seconds since snapshot was written."""
+        return time() - self.created_at
+
+    def is_fresh(self, max_age: float) -> bool:
+        return self.age < max_age
+
+    def get(self, key: Tuple[str, str, str]) -> Optional[SnapshotList]:
+        return self.lists.get(key)
+
+    def close(self) -> None:
+        """Unmaps snapshot, destinations views must not be used after that."""
+        for item in self.lists.values():
+            if isinstance(item.destinations, SnapshotDestinations):
+                item.destinations.release()
+
+        self.lists = {}
+        self._buffer.release()
+        self._mmap.close()
+
+
+def write_snapshot(
+    path: Union[str, "os.PathLike[str]"], lists: Iterable[SnapshotList]
+) -> None:
+    """Writes destination lists to snapshot file, replacing it atomically.
+
+    Snapshot is written to temporary file next to `path` first, so readers see
+    either the old snapshot or the new one, never partially written file.
+    """
+    path = os.fspath(path)
+    temporary_path = f"{path}.{os.getpid()}.{get_ident()}.tmp"
+    try:
+        with open(temporary_path, "wb") as file:
+            _write(file, lists)
+            file.flush()
+            os.fsync(file.fileno())
+
+        os.replace(temporary_path, path)
+    except BaseException:
+        if os.path.exists(temporary_path):
+            os.unlink(temporary_path)
+
+        raise
+
+
+def _write(file: Any, lists: Iterable[SnapshotList]) -> None:
+    file.write(b"\x00" * _HEADER.size)
+    offset = _HEADER.size
+
+    def write_block(data: bytes) -> int:
+        nonlocal offset
+        # Blocks are 8-byte aligned for typed access
+        padding = -offset % 8
+        file.write(b"\x00" * padding + data)
+        start = offset + padding
+        offset = start + len(data)
+        return start
+
+    index = []
+    for item in lists:
+        destinations = list(item.destinations)
+        columns: Dict[str, Any] = {
+            "place_id": write_block(
+                array("q", (d.place_id for d in destinations)).tobytes()
+            ),
+            "lat": write_block(array("d", (d.lat for d in destinations)).tobytes()),
+            "lng": write_block(array("d", (d.lng for d in destinations)).tobytes()),
+        }
+        for name in _STRING_FIELDS:
+            offsets = array("I", [0])
+            encoded = []
+            for destination in destinations:
+                value = getattr(destination, name)
+                data = (_NONE if value is None else value).encode()
+                encoded.append(data)
+                offsets.append(offsets[-1] + len(data))
+
+            offsets_offset = write_block(offsets.tobytes())
+            data_offset = write_block(b"".join(encoded))
+            columns[name] = [offsets_offset, data_offset, offset]
+
+        country, type, filter = item.key
+        index.append(
+            {
+                "country": country,
+                "type": type,
+                "filter": filter,
+                "etag": item.etag,
+                "last_modified": item.last_modified,
+                "fetched_at": item.fetched_at,
+                "rows": len(destinations),
+                "columns": columns,
+            }
+        )
+
+    index_offset = write_block(json.dumps({"lists": index}).encode())
+    file.seek(0)
+    file.write(_HEADER.pack(MAGIC, VERSION, 0, time(), index_offset))
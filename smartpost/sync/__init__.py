@@ -0,0 +1,20 @@
+from typing import TYPE_CHECKING, Any, List
+
+if TYPE_CHECKING:
+    from smartpost.sync.client import Client
+
+__all__ = ["Client"]
+
+
+def __getattr__(name: str) -> Any:
+    # Imported on first use, same as `smartpost.Client`
+    if name == "Client":
+        from smartpost.sync.client import Client
+
+        return Client
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__() -> List[str]:
+    return sorted([*globals(), *__all__])
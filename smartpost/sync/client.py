@@ -1,13 +1,99 @@
-from typing import List, Literal, Optional
+from collections import abc
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from os import PathLike, unlink
+from threading import Lock, Semaphore, Thread
+from types import TracebackType
+from typing import (
+    Callable,
+    ContextManager,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Literal,
+    Optional,
+    Sequence,
+    Tuple,
+    Type,
+    TypeVar,
+    Union,
+)
 
 # We don't use it with untrusted random input
 from xml.etree.ElementTree import Element, SubElement, tostring  # nosec: B405
 
-from httpx import Client as HTTPXClient, Response, Timeout
-from xmltodict import parse as parse_xml  # type: ignore[import]
+from httpx import BaseTransport, Client as HTTPXClient, Limits, Response, Timeout
 
-from smartpost.errors import ShipmentOrderError
-from smartpost.models import Destination, OrderInfo, ShipmentOrder
+from smartpost.cache import (
+    DESTINATION_LISTS,
+    AllDestinations,
+    DestinationCache,
+    DestinationCacheEntry,
+    DestinationKey,
+    LabelCache,
+)
+from smartpost.chunks import (
+    LabelsPipeline,
+    PartialShipment,
+    PartialShipmentResult,
+    chunked,
+    iter_chunks,
+    iter_orders_body,
+    merge_chunk_results,
+)
+from smartpost.errors import ShipmentLabelsError, ShipmentOrderError
+from smartpost.limiter import RequestLimits
+from smartpost.metrics import NULL_MEASUREMENT, Measurement, MetricsHook, measure
+from smartpost.models import (
+    Destination,
+    OrderInfo,
+    ShipmentOrder,
+    encode_xml,
+    xml_element,
+)
+from smartpost.parsing import DestinationParser, parse_xml
+from smartpost.resilience import ResiliencePolicy
+from smartpost.validation import OrderValidator
+
+T = TypeVar("T")
+
+
+def create_http_client(
+    *,
+    read_timeout: int = 10,
+    pool_limits: Optional[Limits] = None,
+    transport: Optional[BaseTransport] = None,
+) -> HTTPXClient:
+    """Creates HTTPX client for SmartPost API that can be shared by many clients.
+
+    Args:
+        read_timeout:
+            seconds to wait for response data.
+        pool_limits:
+            optional `httpx.Limits` with connection pool size and keepalive expiry.
+        transport:
+            optional custom HTTPX transport.
+    """
+    return HTTPXClient(
+        base_url="https://iseteenindus.smartpost.ee/api",
+        http2=True,
+        timeout=Timeout(5, read=read_timeout),
+        limits=pool_limits or Limits(max_connections=100, max_keepalive_connections=20),
+        # HTTPX uses default transport for None, its annotations miss that
+        transport=transport,  # type: ignore[arg-type]
+    )
+
+
+def _completed_chunks(
+    pipeline: LabelsPipeline, pending: Dict["Future[Optional[bytes]]", int], limit: int
+) -> Iterator[Tuple[List[OrderInfo], bytes]]:
+    """Waits until less than `limit` chunks are pending, yields successful ones."""
+    while len(pending) >= limit:
+        done, _ = wait(set(pending), return_when=FIRST_COMPLETED)
+        for future in done:
+            result = pipeline.completed(pending.pop(future), future)
+            if result is not None:
+                yield result
 
 
 class Client:
@@ -19,9 +105,34 @@ class Client:
         password: str = "",  # nosec: B107
         *,
         read_timeout: int = 10,
+        transport: Optional[BaseTransport] = None,
+        http_client: Optional[HTTPXClient] = None,
+        pool_limits: Optional[Limits] = None,
+        destination_cache: Optional[DestinationCache] = None,
+        label_cache: Optional[LabelCache] = None,
+        resilience: Optional[ResiliencePolicy] = None,
+        metrics: Optional[MetricsHook] = None,
+        limits: Optional[RequestLimits] = None,
     ) -> None:
         self._read_timeout = read_timeout
-        self._client: Optional[HTTPXClient] = None
+        # Custom HTTPX transport, e.g. `httpx.MockTransport` for offline benchmarks
+        self._transport = transport
+        self._pool_limits = pool_limits
+        #: Optional cache for destination lists, exposes hit/miss counters
+        self.destination_cache = destination_cache
+        #: Optional cache for labels PDF files, exposes hit/miss counters
+        self.label_cache = label_cache
+        #: Optional retries and circuit breaker, exposes its state with `stats`
+        self.resilience = resilience
+        #: Optional hook called with `RequestRecord` of every API call
+        self.metrics = metrics
+        #: Optional rate and adaptive concurrency limits per request type
+        self.limits = limits
+        # Shared HTTPX client (e.g. from `create_http_client`) is not closed by us
+        self._client = http_client
+        self._owns_client = http_client is None
+        # Worker threads (chunks, labels) may be the first to use the client
+        self._client_lock = Lock()
 
         # XML element "authentication" will be sent with requests that require auth
 
@@ -30,23 +141,131 @@ class Client:
         password_el = SubElement(self._auth, "password")
         user_el.text = username
         password_el.text = password
+        # Static parts of request documents are rendered once
+        auth_xml = tostring(self._auth).decode()
+        self._orders_xml_start = f"<orders>{auth_xml}"
+        self._labels_xml_start = f"<labels>{auth_xml}"
 
     @property
     def client(self) -> HTTPXClient:
-        if not self._client:
-            self._client = HTTPXClient(
-                base_url="https://iseteenindus.smartpost.ee/api",
-                http2=True,
-                timeout=Timeout(5, read=self._read_timeout),
+        client = self._client
+        if client is not None:
+            return client
+
+        with self._client_lock:
+            if self._client is None:
+                self._client = create_http_client(
+                    read_timeout=self._read_timeout,
+                    pool_limits=self._pool_limits,
+                    transport=self._transport,
+                )
+
+            return self._client
+
+    def __enter__(self) -> "Client":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Closes connections (unless HTTPX client is shared)."""
+        if self._client is not None and self._owns_client:
+            client, self._client = self._client, None
+            client.close()
+
+    def warmup(self) -> None:
+        """Opens connection to SmartPost API ahead of the first real request."""
+        self.client.head("/")
+
+    def _resilient(self, factory: Callable[[], T], retry: bool = True) -> T:
+        """Runs request through `resilience` policy if it is set."""
+        if self.resilience is None:
+            return factory()
+
+        return self.resilience.run_sync(factory, retry)
+
+    def _limited(self, request: str, factory: Callable[[], T]) -> T:
+        """Runs request once `limits` for its type allow it."""
+        limiter = self.limits.get(request) if self.limits is not None else None
+        if limiter is None:
+            return factory()
+
+        return limiter.run_sync(factory)
+
+    def get(
+        self, request: str, headers: Optional[Dict[str, str]] = None, **kwargs: str
+    ) -> Response:
+        return self._resilient(
+            lambda: self._limited(
+                request,
+                lambda: self.client.get(
+                    "/", params={"request": request, **kwargs}, headers=headers or {}
+                ),
             )
+        )
 
-        return self._client
+    def post(
+        self,
+        request: str,
+        xml_content: Union[bytes, Iterable[bytes]],
+        *,
+        retry: bool = True,
+        measurement: Measurement = NULL_MEASUREMENT,
+    ) -> Response:
+        return self._resilient(
+            lambda: self._send_post(request, xml_content, measurement), retry
+        )
+
+    def _send_post(
+        self,
+        request: str,
+        xml_content: Union[bytes, Iterable[bytes]],
+        measurement: Measurement,
+    ) -> Response:
+        if measurement is NULL_MEASUREMENT:
+            return self._limited(
+                request,
+                lambda: self.client.post(
+                    "/", params={"request": request}, content=xml_content
+                ),
+            )
 
-    def get(self, request: str, **kwargs: str) -> Response:
-        return self.client.get("/", params={"request": request, **kwargs})
+        # Streamed to tell time to first byte from time to read the body
+        with self.stream("POST", request, content=xml_content) as response:
+            measurement.responded(response)
+            measurement.received(len(response.read()))
 
-    def post(self, request: str, xml_content: bytes) -> Response:
-        return self.client.post("/", params={"request": request}, content=xml_content)
+        return response
+
+    def stream(
+        self,
+        method: str,
+        request: str,
+        params: Optional[Dict[str, str]] = None,
+        *,
+        content: Union[bytes, Iterable[bytes], None] = None,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> ContextManager[Response]:
+        """Sends request and returns context manager with not yet read response."""
+        stream = self.client.stream(
+            method,
+            "/",
+            params={"request": request, **(params or {})},
+            # HTTPX treats None as "no content", its annotations just miss that
+            content=content,  # type: ignore[arg-type]
+            headers=headers or {},
+        )
+        limiter = self.limits.get(request) if self.limits is not None else None
+        if limiter is None:
+            return stream
+
+        return limiter.stream_sync(stream)
 
     def get_ee_terminals(self) -> List[Destination]:
         """Fetches list of all Estonia terminals.
@@ -54,10 +273,7 @@ class Client:
         Returns:
             A list of `Destination` instances representing all Estonia terminals.
         """
-        response = self.get("destinations", country="EE", type="APT")
-        # TODO: Add request errors handling
-        destinations = parse_xml(response.read(), force_list=("item",))
-        return [Destination(**item) for item in destinations["destinations"]["item"]]
+        return self._get_destinations("EE", "APT")
 
     def get_ee_express_terminals(self) -> List[Destination]:
         """Fetches list of all Estonia express terminals.
@@ -66,10 +282,7 @@ class Client:
             A list of `Destination` instances
             representing all Estonia express terminals.
         """
-        response = self.get("destinations", country="EE", type="APT", filter="express")
-        # TODO: Add request errors handling
-        destinations = parse_xml(response.read(), force_list=("item",))
-        return [Destination(**item) for item in destinations["destinations"]["item"]]
+        return self._get_destinations("EE", "APT", "express")
 
     def get_fi_terminals(self) -> List[Destination]:
         """Fetches list of all Finland terminals.
@@ -77,10 +290,7 @@ class Client:
         Returns:
             A list of `Destination` instances representing all Finland terminals.
         """
-        response = self.get("destinations", country="FI", type="APT")
-        # TODO: Add request errors handling
-        destinations = parse_xml(response.read(), force_list=("item",))
-        return [Destination(**item) for item in destinations["destinations"]["item"]]
+        return self._get_destinations("FI", "APT")
 
     def get_fi_post_offices(self) -> List[Destination]:
         """Fetches list of all Finland post offices.
@@ -88,47 +298,453 @@ class Client:
         Returns:
             A list of `Destination` instances representing all Finland post offices.
         """
-        response = self.get("destinations", country="FI", type="PO")
-        # TODO: Add request errors handling
-        destinations = parse_xml(response.read(), force_list=("item",))
-        return [Destination(**item) for item in destinations["destinations"]["item"]]
+        return self._get_destinations("FI", "PO")
+
+    def get_all_destinations(self) -> AllDestinations:
+        """Fetches all terminal and post office lists concurrently.
+
+        Requests are made from internal thread pool and destination cache is
+        used the same way as by `get_*` methods. List that failed to load does
+        not fail the others, its error is reported in result instead.
+
+        Returns:
+            `AllDestinations` with lists that were loaded and errors of the rest.
+        """
+        with ThreadPoolExecutor(
+            max_workers=len(DESTINATION_LISTS),
+            thread_name_prefix="smartpost-destinations",
+        ) as executor:
+            futures = [
+                executor.submit(self._get_destinations, *key)
+                for key in DESTINATION_LISTS.values()
+            ]
+
+        return AllDestinations.from_outcomes(
+            [future.exception() or future.result() for future in futures]
+        )
+
+    def iter_ee_terminals(self) -> Iterator[Destination]:
+        """Streams all Estonia terminals, yielding them while response is read.
+
+        Destination cache is not used, every call makes a request.
+        """
+        return self._iter_destinations("EE", "APT")
+
+    def iter_ee_express_terminals(self) -> Iterator[Destination]:
+        """Streams all Estonia express terminals, yielding them while response is read.
+
+        Destination cache is not used, every call makes a request.
+        """
+        return self._iter_destinations("EE", "APT", "express")
+
+    def iter_fi_terminals(self) -> Iterator[Destination]:
+        """Streams all Finland terminals, yielding them while response is read.
+
+        Destination cache is not used, every call makes a request.
+        """
+        return self._iter_destinations("FI", "APT")
+
+    def iter_fi_post_offices(self) -> Iterator[Destination]:
+        """Streams all Finland post offices, yielding them while response is read.
+
+        Destination cache is not used, every call makes a request.
+        """
+        return self._iter_destinations("FI", "PO")
+
+    def _iter_destinations(
+        self, country: str, type: str, filter: str = ""
+    ) -> Iterator[Destination]:
+        params = {"country": country, "type": type}
+        if filter:
+            params["filter"] = filter
+
+        stream = self.stream("GET", "destinations", params)
+        with measure(self.metrics, "destinations") as measurement, stream as response:
+            measurement.responded(response)
+            if response.status_code >= 500:
+                # Error page is not a destinations document, don't feed it to parser
+                response.raise_for_status()
+
+            parser = DestinationParser()
+            for chunk in response.iter_bytes():
+                measurement.received(len(chunk))
+                measurement.start_parsing()
+                destinations = parser.feed(chunk)
+                measurement.stop_parsing()
+                measurement.count(len(destinations))
+                yield from destinations
+
+            destinations = parser.close()
+            measurement.count(len(destinations))
+            yield from destinations
+
+    def _get_destinations(
+        self, country: str, type: str, filter: str = ""
+    ) -> List[Destination]:
+        if self.destination_cache is None:
+            entry = self._fetch_destinations(country, type, filter)
+            return entry.destinations
+
+        cache = self.destination_cache
+        key = cache.key(country, type, filter)
+        cached = cache.lookup(key)
+        if cached is None:
+            entry = self._fetch_destinations(country, type, filter)
+            cache.store(key, entry)
+            return list(entry.destinations)
+
+        if not cache.is_fresh(cached) and cache.start_refresh(key):
+            # Serve stale list right away, refresh it in background
+            Thread(
+                target=self._refresh_destinations,
+                args=(cache, key, cached),
+                daemon=True,
+            ).start()
+
+        return list(cached.destinations)
+
+    def _fetch_destinations(
+        self,
+        country: str,
+        type: str,
+        filter: str = "",
+        cached: Optional[DestinationCacheEntry] = None,
+    ) -> DestinationCacheEntry:
+        """Requests destinations, revalidating `cached` entry if it is passed."""
+        with measure(self.metrics, "destinations") as measurement:
+            return self._resilient(
+                lambda: self._request_destinations(
+                    country, type, filter, cached, measurement
+                )
+            )
+
+    def _request_destinations(
+        self,
+        country: str,
+        type: str,
+        filter: str,
+        cached: Optional[DestinationCacheEntry],
+        measurement: Measurement,
+    ) -> DestinationCacheEntry:
+        params = {"country": country, "type": type}
+        if filter:
+            params["filter"] = filter
+
+        validators = cached.validators if cached else None
+        stream = self.stream("GET", "destinations", params, headers=validators)
+        with stream as response:
+            measurement.responded(response)
+            if cached and response.status_code == 304:
+                return cached
+
+            if response.status_code >= 500:
+                # Error page is not a destinations document, let it be retried
+                response.raise_for_status()
+
+            parser = DestinationParser()
+            destinations = []
+            for chunk in response.iter_bytes():
+                measurement.received(len(chunk))
+                measurement.start_parsing()
+                destinations.extend(parser.feed(chunk))
+                measurement.stop_parsing()
+
+            destinations.extend(parser.close())
+            measurement.count(len(destinations))
+
+        return DestinationCacheEntry(
+            destinations,
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified"),
+        )
+
+    def _refresh_destinations(
+        self,
+        cache: DestinationCache,
+        key: DestinationKey,
+        entry: DestinationCacheEntry,
+    ) -> None:
+        failed = True
+        try:
+            fresh = self._fetch_destinations(*key, cached=entry)
+            if fresh is entry:
+                cache.revalidated(key)
+            else:
+                cache.store(key, fresh)
+
+            failed = False
+        except Exception:  # noqa: PIE786 - stale entry is kept until next refresh
+            pass
+        finally:
+            # Refresh must not stay marked as running, other clients may share
+            # the cache
+            cache.finish_refresh(key, failed=failed)
+
+    def _orders_start(self, report_emails: Optional[List[str]]) -> str:
+        parts = [self._orders_xml_start]
+        if report_emails:
+            parts.append("<report>")
+            parts.extend(xml_element("email", email) for email in report_emails)
+            parts.append("</report>")
+        else:
+            parts.append("<report />")
+
+        return "".join(parts)
+
+    def _orders_document(
+        self,
+        shipment_orders: Sequence[ShipmentOrder],
+        report_emails: Optional[List[str]],
+    ) -> bytes:
+        orders_xml = "".join(order.to_xml_string() for order in shipment_orders)
+        return encode_xml(f"{self._orders_start(report_emails)}{orders_xml}</orders>")
+
+    def _labels_document(self, format: str, barcodes: List[str]) -> bytes:
+        format_xml = xml_element("format", format)
+        barcodes_xml = "".join(xml_element("barcode", barcode) for barcode in barcodes)
+        return encode_xml(
+            f"{self._labels_xml_start}{format_xml}{barcodes_xml}</labels>"
+        )
 
     def add_shipment_orders(
         self,
-        shipment_orders: List[ShipmentOrder],
+        shipment_orders: Iterable[ShipmentOrder],
         report_emails: Optional[List[str]] = None,
+        *,
+        chunk_size: Optional[int] = None,
+        max_concurrency: int = 4,
     ) -> List[OrderInfo]:
         """Adds shipment orders to SmartPost system.
 
         Args:
             shipment_orders:
-                a list of `ShipmentOrder` instances representing orders to be added.
+                a list of `ShipmentOrder` instances representing orders to be added,
+                or iterable of them (e.g. database cursor) - such orders are
+                encoded and sent while iterated, in a single request.
             report_emails:
                 optional list of strings with emails to which
                 reports about order will be sent.
+            chunk_size:
+                optional maximum number of orders per request, orders are split
+                into chunks and sent concurrently when it is set.
+            max_concurrency:
+                maximum number of chunks being sent at the same time.
+                Both parameters are ignored when `shipment_orders` is iterable.
 
         Returns:
-            A list of `OrderInfo` instances representing all added orders.
+            A list of `OrderInfo` instances representing all added orders
+            (in the same order as `shipment_orders`).
 
         Raises:
             ShipmentOrderError:
                 SmartPost API had issues with shipment orders you sent.
+            ShipmentOrderBatchError:
+                SmartPost API rejected some of the chunks, other chunks were added.
+            IncompleteShipmentError:
+                some of the chunks failed for other reasons (e.g. network issue),
+                `orders_info` of the error has orders from chunks that were added.
         """
-        document = Element("orders")
-        document.insert(0, self._auth)
-        report_el = SubElement(document, "report")
-        for email in report_emails or []:
-            email_el = SubElement(report_el, "email")
-            email_el.text = email
+        if not isinstance(shipment_orders, abc.Sequence):
+            return self._stream_shipment_orders(shipment_orders, report_emails)
+
+        if chunk_size is None or len(shipment_orders) <= chunk_size:
+            return self._add_shipment_orders(shipment_orders, report_emails)
+
+        chunks = chunked(shipment_orders, chunk_size)
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            futures = [
+                executor.submit(self._add_shipment_orders, chunk, report_emails)
+                for chunk in chunks
+            ]
+            results = [future.exception() or future.result() for future in futures]
+
+        return merge_chunk_results(chunks, results)
+
+    def add_valid_shipment_orders(
+        self,
+        shipment_orders: List[ShipmentOrder],
+        report_emails: Optional[List[str]] = None,
+        *,
+        validator: Optional[OrderValidator] = None,
+        express: bool = False,
+    ) -> PartialShipmentResult:
+        """Adds shipment orders, leaving out the ones SmartPost API rejects.
+
+        When SmartPost API rejects request, its error details are matched to
+        orders (by barcode or reference) and the rest of the orders are sent
+        again in one follow-up request. With `validator`, orders that fail local
+        checks are left out before the first request.
+
+        Args:
+            shipment_orders:
+                a list of `ShipmentOrder` instances representing orders to be added.
+            report_emails:
+                optional list of strings with emails to which
+                reports about order will be sent.
+            validator:
+                optional `OrderValidator` to check orders before sending them.
+            express:
+                orders are sent with express service (passed to `validator`).
+
+        Returns:
+            `PartialShipmentResult` with `OrderInfo` of every added order (in the
+            same order as `shipment_orders`) and rejected orders with errors.
+
+        Raises:
+            ShipmentOrderError:
+                SmartPost API returned errors that do not match any order.
+        """
+        invalid = None
+        if validator is not None:
+            _, invalid = validator.split(shipment_orders, express=express)
+
+        shipment = PartialShipment(shipment_orders, invalid)
+        while shipment.indexes:
+            try:
+                orders_info = self._add_shipment_orders(shipment.pending, report_emails)
+            except ShipmentOrderError as exc:
+                # Raised again when it's not clear which orders are wrong
+                shipment.rejected(exc)
+            else:
+                shipment.added(orders_info)
+
+        return shipment.result
+
+    def _add_shipment_orders(
+        self,
+        shipment_orders: Sequence[ShipmentOrder],
+        report_emails: Optional[List[str]],
+    ) -> List[OrderInfo]:
+        content = self._orders_document(shipment_orders, report_emails)
+        with measure(self.metrics, "shipment", len(content)) as measurement:
+            measurement.count(len(shipment_orders))
+            # Orders without barcodes could be added twice if response was lost
+            response = self.post(
+                "shipment",
+                content,
+                retry=all(order.barcode for order in shipment_orders),
+                measurement=measurement,
+            )
+            return self._parse_orders_info(response, measurement)
+
+    def _stream_shipment_orders(
+        self,
+        shipment_orders: Iterable[ShipmentOrder],
+        report_emails: Optional[List[str]],
+    ) -> List[OrderInfo]:
+        with measure(self.metrics, "shipment") as measurement:
+            body = iter_orders_body(
+                self._orders_start(report_emails),
+                shipment_orders,
+                "</orders>",
+                measurement,
+            )
+            # Body can be iterated only once, so request can't be retried
+            response = self.post("shipment", body, retry=False, measurement=measurement)
+            return self._parse_orders_info(response, measurement)
 
-        document.extend(order.to_xml() for order in shipment_orders)
-        response = self.post("shipment", tostring(document))
+    def _parse_orders_info(
+        self, response: Response, measurement: Measurement
+    ) -> List[OrderInfo]:
+        measurement.start_parsing()
         if response.status_code == 400:
             errors = parse_xml(response.read(), force_list=("item",))
+            measurement.stop_parsing()
             raise ShipmentOrderError(errors)
 
         orders = parse_xml(response.read(), force_list=("item",))
-        return [OrderInfo(**order) for order in orders["orders"]["item"]]
+        orders_info = [OrderInfo(**order) for order in orders["orders"]["item"]]
+        measurement.stop_parsing()
+        return orders_info
+
+    def add_shipment_orders_with_labels(
+        self,
+        shipment_orders: Iterable[ShipmentOrder],
+        format: Literal["A5", "A6", "A6-4", "A7", "A7-8"],
+        report_emails: Optional[List[str]] = None,
+        *,
+        chunk_size: int = 100,
+        max_order_requests: int = 2,
+        max_label_requests: int = 2,
+    ) -> Iterator[Tuple[List[OrderInfo], bytes]]:
+        """Adds shipment orders in chunks and requests labels for every chunk.
+
+        Labels for a chunk are requested as soon as its orders are added, while
+        next chunks are being added (in thread pool). Orders are read from
+        `shipment_orders` only as fast as chunks are processed.
+
+        Args:
+            shipment_orders:
+                list or iterable of `ShipmentOrder` instances.
+            format:
+                a string with PDF page format, any of the following:
+                A5, A6, A6-4, A7, A7-8.
+            report_emails:
+                optional list of strings with emails to which
+                reports about order will be sent.
+            chunk_size:
+                maximum number of orders per request.
+            max_order_requests:
+                maximum number of `add_shipment_orders` requests at the same time.
+            max_label_requests:
+                maximum number of `get_labels_pdf` requests at the same time.
+
+        Yields:
+            (`OrderInfo` list, labels PDF file bytes) pair for every chunk, in
+            order chunks are completed.
+
+        Raises:
+            ShipmentOrderBatchError:
+                SmartPost API rejected orders of some chunks.
+            IncompleteShipmentError:
+                some chunks failed for other reasons (e.g. network issue or
+                failed labels request).
+
+            After the first failed chunk no more chunks are sent, chunks that
+            are already being processed are finished (and yielded) before the
+            error is raised. `orders_info` of the error has orders of all added
+            chunks, including ones whose labels could not be requested.
+        """
+        orders_semaphore = Semaphore(max_order_requests)
+        labels_semaphore = Semaphore(max_label_requests)
+        pipeline = LabelsPipeline()
+
+        def process(index: int, chunk: List[ShipmentOrder]) -> Optional[bytes]:
+            with orders_semaphore:
+                if pipeline.stopped or pipeline.closed:
+                    return None
+
+                orders_info = self._add_shipment_orders(chunk, report_emails)
+                pipeline.added[index] = orders_info
+
+            with labels_semaphore:
+                if pipeline.closed:
+                    return None
+
+                # Raises ShipmentLabelsError for error response, so that chunk
+                # is reported as failed instead of yielding error body as PDF
+                barcodes = [info.barcode for info in orders_info]
+                return self.get_labels_pdf(format, barcodes)
+
+        # Enough chunks to keep both stages busy, the rest waits in iterator
+        max_pending = max_order_requests + max_label_requests
+        pending: Dict["Future[Optional[bytes]]", int] = {}
+        # Leaving the block waits for requests in progress instead of
+        # cancelling them, so that orders are not left half-added
+        with ThreadPoolExecutor(max_workers=max_pending) as executor:
+            try:
+                for chunk in iter_chunks(shipment_orders, chunk_size):
+                    index = pipeline.add(chunk)
+                    pending[executor.submit(process, index, chunk)] = index
+                    yield from _completed_chunks(pipeline, pending, max_pending)
+                    if pipeline.stopped:
+                        break
+
+                yield from _completed_chunks(pipeline, pending, 1)
+            finally:
+                pipeline.closed = True
+
+        pipeline.raise_for_errors()
 
     def get_labels_pdf(
         self,
@@ -147,19 +763,169 @@ class Client:
         Returns:
             A PDF file bytes. File will contain a page for each barcode provided in
             `barcodes` argument, all pages will be in format from `format` argument.
+            With `label_cache`, cached PDF file is returned without request.
+
+        Raises:
+            ShipmentLabelsError:
+                SmartPost API responded with error instead of PDF file.
+            httpx.ReadTimeout:
+                SmartPost API did not manage to send PDF file in time.
+        """
+        if self.label_cache is not None:
+            pdf = self.label_cache.get(self.label_cache.key(format, barcodes))
+            if pdf is not None:
+                return pdf
+
+        return self._fetch_labels_pdf(format, barcodes)
+
+    def _fetch_labels_pdf(self, format: str, barcodes: List[str]) -> bytes:
+        """Requests labels PDF file (skipping cache lookup) and caches it."""
+        content = self._labels_document(format, barcodes)
+        with measure(self.metrics, "labels", len(content)) as measurement:
+            measurement.count(len(barcodes))
+            response = self.post("labels", content, measurement=measurement)
+
+        if response.status_code != 200:
+            raise ShipmentLabelsError(response.read(), response.status_code)
+
+        pdf = response.read()
+        if self.label_cache is not None:
+            self.label_cache.store(self.label_cache.key(format, barcodes), pdf)
+
+        return pdf
+
+    def get_label_pdfs(
+        self,
+        format: Literal["A5", "A6", "A6-4", "A7", "A7-8"],
+        barcodes: List[str],
+        *,
+        max_concurrency: int = 4,
+    ) -> Dict[str, bytes]:
+        """Requests separate PDF file with label for every order.
+
+        Every label is requested on its own, so with `label_cache` only labels
+        that are not cached yet are requested from SmartPost.
+
+        Args:
+            format:
+                a string with PDF page format, any of the following:
+                A5, A6, A6-4, A7, A7-8.
+            barcodes:
+                a list of strings with order barcodes for which labels are requested.
+            max_concurrency:
+                maximum number of labels being requested at the same time.
+
+        Returns:
+            A dict with barcodes as keys and PDF file bytes with their labels
+            as values.
 
         Raises:
+            ShipmentLabelsError:
+                SmartPost API responded with error instead of PDF file.
             httpx.ReadTimeout:
                 SmartPost API did not manage to send PDF file in time.
         """
-        document = Element("labels")
-        document.insert(0, self._auth)
-        format_el = SubElement(document, "format")
-        format_el.text = format
-        for barcode in barcodes:
-            barcode_el = SubElement(document, "barcode")
-            barcode_el.text = barcode
-
-        response = self.post("labels", tostring(document))
-        # TODO: Add request errors handling
-        return response.read()
+        unique_barcodes = list(dict.fromkeys(barcodes))
+        pdfs: Dict[str, bytes] = {}
+        missing = []
+        for barcode in unique_barcodes:
+            pdf = None
+            if self.label_cache is not None:
+                pdf = self.label_cache.get(self.label_cache.key(format, [barcode]))
+
+            if pdf is None:
+                missing.append(barcode)
+            else:
+                pdfs[barcode] = pdf
+
+        # Threads are started only for labels that are actually requested
+        if len(missing) == 1:
+            pdfs[missing[0]] = self._fetch_labels_pdf(format, missing)
+        elif missing:
+            workers = min(max_concurrency, len(missing))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                fetched = executor.map(
+                    lambda barcode: self._fetch_labels_pdf(format, [barcode]), missing
+                )
+                pdfs.update(zip(missing, fetched))
+
+        return {barcode: pdfs[barcode] for barcode in unique_barcodes}
+
+    def stream_labels_pdf(
+        self,
+        format: Literal["A5", "A6", "A6-4", "A7", "A7-8"],
+        barcodes: List[str],
+    ) -> Iterator[bytes]:
+        """Requests PDF file with labels for orders and yields it in chunks.
+
+        Unlike `get_labels_pdf`, whole PDF file is never kept in memory.
+
+        Args:
+            format:
+                a string with PDF page format, any of the following:
+                A5, A6, A6-4, A7, A7-8.
+            barcodes:
+                a list of strings with order barcodes for which labels are requested.
+
+        Yields:
+            PDF file bytes chunks as they are received.
+
+        Raises:
+            ShipmentLabelsError:
+                SmartPost API responded with error instead of PDF file.
+            httpx.ReadTimeout:
+                SmartPost API did not manage to send PDF file in time.
+        """
+        content = self._labels_document(format, barcodes)
+        stream = self.stream("POST", "labels", content=content)
+        with measure(self.metrics, "labels", len(content)) as measurement:
+            measurement.count(len(barcodes))
+            with stream as response:
+                measurement.responded(response)
+                if response.status_code != 200:
+                    raise ShipmentLabelsError(response.read(), response.status_code)
+
+                for chunk in response.iter_bytes():
+                    measurement.received(len(chunk))
+                    yield chunk
+
+    def save_labels_pdf(
+        self,
+        format: Literal["A5", "A6", "A6-4", "A7", "A7-8"],
+        barcodes: List[str],
+        path: Union[str, "PathLike[str]"],
+    ) -> int:
+        """Requests PDF file with labels for orders and writes it to file.
+
+        PDF file is written chunk by chunk as it is received. If request fails,
+        partially written file is removed.
+
+        Args:
+            format:
+                a string with PDF page format, any of the following:
+                A5, A6, A6-4, A7, A7-8.
+            barcodes:
+                a list of strings with order barcodes for which labels are requested.
+            path:
+                path of the file PDF will be written to.
+
+        Returns:
+            Number of bytes written.
+
+        Raises:
+            ShipmentLabelsError:
+                SmartPost API responded with error instead of PDF file.
+            httpx.ReadTimeout:
+                SmartPost API did not manage to send PDF file in time.
+        """
+        written = 0
+        with open(path, "wb") as file:
+            try:
+                for chunk in self.stream_labels_pdf(format, barcodes):
+                    written += file.write(chunk)
+            except BaseException:
+                file.close()
+                unlink(path)
+                raise
+
+        return written
@@ -0,0 +1,95 @@
+from array import array
+from sys import intern
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from smartpost.models import Destination
+
+
+def _intern(value: str) -> str:
+    # Empty values come as None from XML
+    return intern(value) if value else value
+
+
+class DestinationTable:
+    """Compact columnar storage for destinations.
+
+    Numeric columns (`place_id`, `lat`, `lng`) are kept in typed arrays and
+    frequently repeated strings (`country`, `city`, `availability`) are interned,
+    so holding all destinations takes a fraction of memory of `Destination`
+    instances. Destinations are materialized on demand when rows are accessed.
+    """
+
+    def __init__(self, destinations: Iterable[Destination] = ()) -> None:
+        self.place_id = array("q")
+        self.lat = array("d")
+        self.lng = array("d")
+        self.name: List[str] = []
+        self.city: List[str] = []
+        self.address: List[str] = []
+        self.country: List[str] = []
+        self.postalcode: List[str] = []
+        self.routingcode: List[str] = []
+        self.availability: List[str] = []
+        self.description: List[str] = []
+        self._rows: Dict[int, int] = {}
+        self.extend(destinations)
+
+    def __len__(self) -> int:
+        return len(self.place_id)
+
+    def __contains__(self, place_id: object) -> bool:
+        return place_id in self._rows
+
+    def __iter__(self) -> Iterator[Destination]:
+        return (self._materialize(row) for row in range(len(self)))
+
+    def __getitem__(self, row: int) -> Destination:
+        if row < 0:
+            row += len(self)
+
+        if not 0 <= row < len(self):
+            raise IndexError("DestinationTable index out of range")
+
+        return self._materialize(row)
+
+    def append(self, destination: Destination) -> None:
+        """Adds destination row, `place_id` is expected to be unique."""
+        self._rows[destination.place_id] = len(self.place_id)
+        self.place_id.append(destination.place_id)
+        self.lat.append(destination.lat)
+        self.lng.append(destination.lng)
+        self.name.append(destination.name)
+        self.city.append(_intern(destination.city))
+        self.address.append(destination.address)
+        self.country.append(_intern(destination.country))
+        self.postalcode.append(destination.postalcode)
+        self.routingcode.append(destination.routingcode)
+        self.availability.append(_intern(destination.availability))
+        self.description.append(destination.description)
+
+    def extend(self, destinations: Iterable[Destination]) -> None:
+        for destination in destinations:
+            self.append(destination)
+
+    def get(self, place_id: int) -> Optional[Destination]:
+        """Looks up destination by `place_id`."""
+        row = self._rows.get(place_id)
+        return self._materialize(row) if row is not None else None
+
+    def to_list(self) -> List[Destination]:
+        return list(self)
+
+    def _materialize(self, row: int) -> Destination:
+        return Destination(
+            place_id=self.place_id[row],
+            name=self.name[row],
+            city=self.city[row],
+            address=self.address[row],
+            country=self.country[row],  # type: ignore[arg-type]
+            postalcode=self.postalcode[row],
+            routingcode=self.routingcode[row],
+            availability=self.availability[row],
+            description=self.description[row],
+            lat=self.lat[row],
+            lng=self.lng[row],
+        )
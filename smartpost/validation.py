@@ -0,0 +1,162 @@
+import re
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from smartpost.cache import DestinationCache
+from smartpost.errors import ShipmentOrderErrorDetails, errors_explanation
+from smartpost.models import (
+    Destination,
+    EETerminalDestination,
+    FIDestination,
+    ShipmentOrder,
+)
+
+#: Door sizes accepted by SmartPost API (same as `ShipmentOrder.size`)
+DOOR_SIZES = frozenset((5, 6, 7, 8, 11))
+# Checks are deliberately loose - valid orders must never be rejected locally
+_PHONE = re.compile(r"\+?[0-9][0-9 ()-]{4,19}")
+_EMAIL = re.compile(r"[^@\s]+@[^@\s]+\.[^@\s]+")
+
+
+def error_details(
+    order: ShipmentOrder, code: str, field: str, input: Optional[str]
+) -> ShipmentOrderErrorDetails:
+    """Creates error details for order, same as SmartPost API would return."""
+    return ShipmentOrderErrorDetails(
+        {
+            "barcode": order.barcode,
+            "reference": order.reference,
+            "error": {
+                "code": code,
+                "text": errors_explanation[code],
+                "input": input,
+                "field": field,
+            },
+        }
+    )
+
+
+class OrderValidator:
+    """Checks shipment orders locally, before they are sent to SmartPost API.
+
+    Catches errors SmartPost API would reject the whole request for: missing
+    recipient fields (001), malformed phone (003) or e-mail (004), unknown
+    destination (006), express service to regular terminal (007) and invalid
+    door size (014). Destinations are checked only for countries that have
+    destination lists, lookups are O(1) dict/set lookups.
+
+    Args:
+        destinations:
+            cached terminal and post office lists (result of `get_*` methods).
+        express_destinations:
+            result of `get_ee_express_terminals`, used to check express orders.
+    """
+
+    def __init__(
+        self,
+        destinations: Iterable[Destination] = (),
+        express_destinations: Optional[Iterable[Destination]] = None,
+    ) -> None:
+        self._place_ids: Set[int] = set()
+        self._routing_codes: Set[str] = set()
+        self._countries: Set[str] = set()
+        for destination in destinations:
+            self._countries.add(destination.country)
+            if destination.country == "FI":
+                self._routing_codes.add(destination.routingcode)
+            else:
+                self._place_ids.add(destination.place_id)
+
+        self._express_place_ids: Optional[Set[int]] = None
+        if express_destinations is not None:
+            self._express_place_ids = {d.place_id for d in express_destinations}
+            self._place_ids |= self._express_place_ids
+            self._countries.add("EE")
+
+    @classmethod
+    def from_cache(cls, cache: DestinationCache) -> "OrderValidator":
+        """Creates validator from lists cached by `Client` (fresh or stale)."""
+        destinations: List[Destination] = []
+        for country, type in (("EE", "APT"), ("FI", "APT"), ("FI", "PO")):
+            entry = cache.peek(cache.key(country, type))
+            if entry is not None:
+                destinations.extend(entry.destinations)
+
+        express = cache.peek(cache.key("EE", "APT", "express"))
+        return cls(destinations, express.destinations if express else None)
+
+    def validate(
+        self, order: ShipmentOrder, *, express: bool = False
+    ) -> List[ShipmentOrderErrorDetails]:
+        """Returns error details for order, empty list if order is valid.
+
+        Args:
+            order:
+                shipment order to check.
+            express:
+                order is sent with express service (it is not part of
+                `ShipmentOrder` yet), destination must be express terminal.
+        """
+        errors = self._recipient_errors(order)
+        errors.extend(self._destination_errors(order, express))
+        if order.size is not None and order.size not in DOOR_SIZES:
+            errors.append(error_details(order, "014", "size", str(order.size)))
+
+        return errors
+
+    def _recipient_errors(
+        self, order: ShipmentOrder
+    ) -> List[ShipmentOrderErrorDetails]:
+        errors = []
+        recipient = order.recipient
+        for field in ("name", "phone", "email"):
+            if not getattr(recipient, field):
+                errors.append(error_details(order, "001", field, None))
+
+        if recipient.phone and not _PHONE.fullmatch(recipient.phone):
+            errors.append(error_details(order, "003", "phone", recipient.phone))
+
+        if recipient.email and not _EMAIL.fullmatch(recipient.email):
+            errors.append(error_details(order, "004", "email", recipient.email))
+
+        return errors
+
+    def _destination_errors(
+        self, order: ShipmentOrder, express: bool
+    ) -> List[ShipmentOrderErrorDetails]:
+        destination = order.destination
+        if isinstance(destination, EETerminalDestination) and "EE" in self._countries:
+            place_id = destination.place_id
+            express_place_ids = self._express_place_ids if express else None
+            if place_id not in self._place_ids:
+                return [error_details(order, "006", "place_id", str(place_id))]
+
+            if express_place_ids is not None and place_id not in express_place_ids:
+                return [error_details(order, "007", "place_id", str(place_id))]
+
+        elif isinstance(destination, FIDestination) and "FI" in self._countries:
+            routing_code = destination.routingcode
+            if routing_code not in self._routing_codes:
+                return [error_details(order, "006", "routingcode", routing_code)]
+
+        return []
+
+    def split(
+        self, shipment_orders: Sequence[ShipmentOrder], *, express: bool = False
+    ) -> Tuple[List[ShipmentOrder], Dict[int, List[ShipmentOrderErrorDetails]]]:
+        """Separates valid orders from invalid ones.
+
+        Returns:
+            A tuple with list of valid orders (in input order) that can be sent
+            in one request, and dict that maps indexes in `shipment_orders` to
+            error details (same shape as `match_order_errors` result).
+        """
+        valid = []
+        invalid: Dict[int, List[ShipmentOrderErrorDetails]] = {}
+        for index, order in enumerate(shipment_orders):
+            errors = self.validate(order, express=express)
+            if errors:
+                invalid[index] = errors
+            else:
+                valid.append(order)
+
+        return valid, invalid